@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.db.models import F
+
+from recipes.models import CacheVersion, Ingredient, Tag
+from api.constants import REFERENCE_CACHE_TIMEOUT
+from api.serializers import IngredientSerializer, TagSerializer
+
+TAGS_CACHE_KEY = 'api:tags'
+TAG_IDS_CACHE_KEY = 'api:tag-ids'
+INGREDIENTS_CACHE_KEY = 'api:ingredients'
+
+
+def get_version(key):
+    """Версия данных из БД: кэш процесса может быть локальным"""
+    return CacheVersion.objects.filter(key=key).values_list(
+        'version', flat=True).first() or 0
+
+
+def bump_version(key):
+    _, created = CacheVersion.objects.get_or_create(
+        key=key, defaults={'version': 1})
+    if not created:
+        CacheVersion.objects.filter(key=key).update(
+            version=F('version') + 1)
+
+
+def _get_cached(key, version_key, build):
+    versioned_key = f'{key}:{get_version(version_key)}'
+    data = cache.get(versioned_key)
+    if data is None:
+        data = build()
+        cache.set(versioned_key, data, REFERENCE_CACHE_TIMEOUT)
+    return data
+
+
+def get_tags():
+    """Сериализованный список тэгов из кэша"""
+    return _get_cached(TAGS_CACHE_KEY, TAGS_CACHE_KEY, lambda: [
+        dict(item) for item in
+        TagSerializer(Tag.objects.all(), many=True).data])
+
+
+def get_tag_ids():
+    """Соответствие слагов тэгов их id из кэша"""
+    return _get_cached(TAG_IDS_CACHE_KEY, TAGS_CACHE_KEY, lambda: dict(
+        Tag.objects.values_list('slug', 'id')))
+
+
+def get_ingredients():
+    """Сериализованный список ингредиентов из кэша"""
+    return _get_cached(INGREDIENTS_CACHE_KEY, INGREDIENTS_CACHE_KEY, lambda: [
+        dict(item) for item in
+        IngredientSerializer(Ingredient.objects.all(), many=True).data])
+
+
+def invalidate_tags():
+    bump_version(TAGS_CACHE_KEY)
+
+
+def invalidate_ingredients():
+    bump_version(INGREDIENTS_CACHE_KEY)
@@ -1,2 +1,15 @@
 MIN_VAL = 1
 MAX_VAL = 32000
+REFERENCE_CACHE_TIMEOUT = 60 * 10
+DEEP_PAGE_ROWS = 60
+SHOPPING_CART_DOWNLOAD_COST = 10
+RECIPE_WRITE_COST = 5
+SUBSCRIPTION_RECIPES_ESTIMATE = 10
+SIMILAR_RECIPES_LIMIT = 6
+MAX_SIMILAR_LIMIT = 50
+RECIPES_BATCH_LIMIT = 100
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+THROTTLE_LOCK_TIMEOUT = 1
+THROTTLE_LOCK_WAIT = 0.05
+THROTTLE_LOCK_POLL_INTERVAL = 0.002
+THROTTLE_SWEEP_INTERVAL = 60
@@ -0,0 +1,157 @@
+import asyncio
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from recipes.models import Recipe
+
+
+TICKET_SALT = 'api.events.ticket'
+
+
+def issue_ticket(user):
+    """Короткоживущий билет для подключения EventSource.
+
+    Браузерный EventSource не передаёт заголовки, а постоянный токен
+    в адресе попадал бы в журналы доступа.
+    """
+    return signing.TimestampSigner(salt=TICKET_SALT).sign(str(user.pk))
+
+
+def read_ticket(ticket):
+    """Id пользователя из билета или None, если билет недействителен"""
+    try:
+        return int(signing.TimestampSigner(salt=TICKET_SALT).unsign(
+            ticket, max_age=settings.EVENTS_TICKET_MAX_AGE))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def recipe_event(recipe):
+    return {
+        'id': recipe.pk,
+        'name': recipe.name,
+        'author': recipe.author_id,
+        'pub_date': recipe.pub_date.isoformat(),
+    }
+
+
+class Subscription:
+    """Очередь событий одного соединения.
+
+    При переполнении отбрасываются самые старые события, чтобы
+    медленный клиент не задерживал остальных.
+    """
+
+    def __init__(self, author_ids):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(settings.EVENTS_QUEUE_SIZE)
+        self.author_ids = set(author_ids)
+        self.dropped = 0
+
+    def put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class InProcessBroker:
+    """Брокер событий в памяти процесса.
+
+    Брокеры для нескольких узлов переопределяют publish, доставляя
+    событие на все узлы, где оно передаётся в dispatch.
+    """
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, author_ids):
+        subscription = Subscription(author_ids)
+        with self.lock:
+            for author_id in subscription.author_ids:
+                self.subscribers[author_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for author_id in subscription.author_ids:
+                subscribers = self.subscribers.get(author_id)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[author_id]
+
+    def publish(self, author_id, event):
+        self.dispatch(author_id, event)
+
+    def dispatch(self, author_id, event):
+        with self.lock:
+            subscriptions = list(self.subscribers.get(author_id, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.put, event)
+
+
+class RecipePollingBroker(InProcessBroker):
+    """Брокер для нескольких процессов без внешней шины.
+
+    Каждый процесс раз в EVENTS_POLL_INTERVAL секунд одним запросом
+    перечитывает рецепты за последние EVENTS_POLL_OVERLAP секунд, пока
+    у него есть подписчики. Рецепт с меньшим id может закоммититься
+    позже соседа, поэтому опрос идёт по окну, а не с последнего id;
+    уже отправленные рецепты из окна пропускаются.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.poller = None
+        self.seen = None
+
+    def subscribe(self, author_ids):
+        subscription = super().subscribe(author_ids)
+        if self.poller is None or self.poller.done():
+            self.poller = asyncio.get_running_loop().create_task(self.poll())
+        return subscription
+
+    def publish(self, author_id, event):
+        pass
+
+    async def poll(self):
+        if self.seen is None:
+            self.seen = {recipe.pk: recipe.pub_date for recipe in
+                         await sync_to_async(self.recent_recipes)()}
+        while self.subscribers:
+            await asyncio.sleep(settings.EVENTS_POLL_INTERVAL)
+            recipes = await sync_to_async(self.recent_recipes)()
+            for recipe in recipes:
+                if recipe.pk in self.seen:
+                    continue
+                self.seen[recipe.pk] = recipe.pub_date
+                self.dispatch(recipe.author_id, recipe_event(recipe))
+
+    def recent_recipes(self):
+        since = timezone.now() - timedelta(
+            seconds=settings.EVENTS_POLL_OVERLAP)
+        if self.seen:
+            self.seen = {pk: pub_date for pk, pub_date in self.seen.items()
+                         if pub_date >= since}
+        return list(Recipe.objects.filter(pub_date__gte=since).only(
+            'id', 'name', 'author_id', 'pub_date').order_by('pub_date', 'pk'))
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.EVENTS_BROKER)()
+    return _broker
@@ -1,23 +1,61 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
 
 from recipes.models import Ingredient, Recipe
+from api.cache import get_tag_ids
 
 User = get_user_model()
 
 
+def tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
+
+
+class StableOrderingFilter(filters.OrderingFilter):
+    """Сортировка с id последним ключом в том же направлении.
+
+    Одинаковое направление позволяет обслужить сортировку в обе
+    стороны одним составным индексом (поле, id).
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        ordering = [self.get_ordering_value(param) for param in value]
+        return qs.order_by(
+            *ordering, '-pk' if ordering[-1].startswith('-') else 'pk')
+
+
 class RecipeFilter(filters.FilterSet):
     """Фильтрация рецептов"""
     author = filters.ModelChoiceFilter(field_name='author',
                                        queryset=User.objects.all(),)
     is_favorited = filters.BooleanFilter(method='get_favorite')
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.MultipleChoiceFilter(choices=tag_choices,
+                                        method='filter_tags')
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart')
+    cooking_time = filters.RangeFilter()
+    pub_date = filters.IsoDateTimeFromToRangeFilter()
+    ordering = StableOrderingFilter(fields=(
+        ('cooking_time', 'cooking_time'),
+        ('name', 'name'),
+        ('pub_date', 'pub_date'),
+        ('popularity_total', 'popularity'),
+    ))
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'cooking_time', 'pub_date')
+
+    def filter_tags(self, queryset, name, value):
+        tag_ids = get_tag_ids()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'),
+            tag_id__in=[tag_ids[slug] for slug in value])))
 
     def get_favorite(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -29,6 +67,29 @@ class RecipeFilter(filters.FilterSet):
             return queryset.filter(shopping_list__user=self.request.user)
         return queryset
 
+    def filter_index(self, index):
+        """Те же фильтры по индексу рецептов: id в порядке выдачи"""
+        data = self.form.cleaned_data
+        user = self.request.user
+        recipe_ids = None
+        if user.is_authenticated:
+            if data.get('is_favorited'):
+                recipe_ids = set(user.user_favorites.values_list(
+                    'recipe_id', flat=True))
+            if data.get('is_in_shopping_cart'):
+                cart = set(user.shopping_list.values_list(
+                    'recipe_id', flat=True))
+                recipe_ids = cart if recipe_ids is None else (
+                    recipe_ids & cart)
+        tag_ids = get_tag_ids()
+        author = data.get('author')
+        return index.filter(
+            tag_ids=[tag_ids[slug] for slug in data.get('tags') or ()],
+            author_id=author.pk if author else None,
+            recipe_ids=recipe_ids,
+            cooking_time=data.get('cooking_time'),
+            published=data.get('pub_date'))
+
 
 class NameIngredientsFilter(filters.FilterSet):
     """Фильтрация ингредиентов"""
@@ -0,0 +1,115 @@
+import hashlib
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from recipes.models import IdempotencyKey
+from api.constants import IDEMPOTENCY_POLL_INTERVAL
+
+KEY_MAX_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def request_fingerprint(request):
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\n'.encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def claim(user, key, fingerprint):
+    """Захват ключа: (запись, захвачен ли ключ этим запросом).
+
+    Истёкший ключ и ключ, брошенный упавшим воркером, захватываются
+    заново; запись может пропасть между попытками, тогда она None.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=user, key=key, fingerprint=fingerprint,
+                created=now), True
+    except IntegrityError:
+        pass
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is None:
+        return None, False
+    expired = record.created < now - timedelta(
+        seconds=settings.IDEMPOTENCY_KEY_TTL)
+    abandoned = record.status_code is None and record.created < now - (
+        timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT))
+    if expired or abandoned:
+        taken = IdempotencyKey.objects.filter(
+            pk=record.pk, created=record.created).update(
+                fingerprint=fingerprint, status_code=None, response=None,
+                created=now)
+        if taken:
+            record.fingerprint = fingerprint
+            record.status_code = record.response = None
+            record.created = now
+            return record, True
+    return record, False
+
+
+def replay(record):
+    response = Response(record.response, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(handler):
+    """Поддержка заголовка Idempotency-Key для изменяющих запросов.
+
+    Повтор с тем же ключом получает сохранённый ответ без повторного
+    выполнения; параллельный повтор ждёт завершения первого запроса.
+    Исключения и ответы 5xx не сохраняются: повтор после них
+    выполняется заново.
+    """
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if (key is None or request.method in SAFE_METHODS
+                or not request.user.is_authenticated):
+            return handler(view, request, *args, **kwargs)
+        if not key or len(key) > KEY_MAX_LENGTH:
+            return Response(
+                {'detail': 'Некорректный ключ идемпотентности'},
+                status=status.HTTP_400_BAD_REQUEST)
+        fingerprint = request_fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+        while True:
+            record, claimed = claim(request.user, key, fingerprint)
+            if claimed:
+                break
+            if record is not None:
+                if record.fingerprint != fingerprint:
+                    return Response(
+                        {'detail': 'Ключ идемпотентности уже использован '
+                                   'для другого запроса'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                if record.status_code is not None:
+                    return replay(record)
+                if time.monotonic() >= deadline:
+                    return Response(
+                        {'detail': 'Запрос с этим ключом ещё выполняется'},
+                        status=status.HTTP_409_CONFLICT)
+                time.sleep(IDEMPOTENCY_POLL_INTERVAL)
+        try:
+            response = handler(view, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            record.status_code = response.status_code
+            record.response = response.data
+            record.save(update_fields=('status_code', 'response'))
+        return response
+    return wrapper
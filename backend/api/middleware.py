@@ -0,0 +1,106 @@
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.authtoken.models import Token
+
+SCRUBBED_FIELDS = frozenset((
+    'password', 'current_password', 'new_password', 're_new_password',
+    'email', 'username', 'first_name', 'last_name',
+    'token', 'auth_token', 'ticket',
+))
+SCRUBBED_VALUE = '***'
+
+
+def scrub(value):
+    """Замена персональных данных и секретов во вложенных структурах"""
+    if isinstance(value, dict):
+        return {key: SCRUBBED_VALUE if key in SCRUBBED_FIELDS
+                else scrub(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [scrub(item) for item in value]
+    return value
+
+
+def scrub_query(query):
+    return urlencode([
+        (key, SCRUBBED_VALUE if key in SCRUBBED_FIELDS else item)
+        for key, item in parse_qsl(query, keep_blank_values=True)],
+        safe='*,')
+
+
+class TrafficCaptureMiddleware:
+    """Запись выборки запросов к API в JSONL для replay_traffic"""
+
+    lock = threading.Lock()
+
+    def __init__(self, get_response):
+        if not settings.TRAFFIC_CAPTURE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (not request.path.startswith('/api/')
+                or random.random() >= settings.TRAFFIC_CAPTURE_RATE):
+            return self.get_response(request)
+        body = self.get_body(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        record = {
+            'timestamp': time.time(),
+            'method': request.method,
+            'path': request.path,
+            'query': scrub_query(request.META.get('QUERY_STRING', '')),
+            'body': body,
+            'user': self.anonymize(request),
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self.lock, open(settings.TRAFFIC_CAPTURE_FILE, 'a',
+                             encoding='utf-8') as file:
+            file.write(line)
+        return response
+
+    @staticmethod
+    def get_body(request):
+        if (request.method in ('GET', 'HEAD', 'OPTIONS')
+                or request.content_type != 'application/json'):
+            return None
+        # Тело читается только после проверки размера: чтение большого
+        # тела из middleware упало бы на DATA_UPLOAD_MAX_MEMORY_SIZE
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return None
+        if not 0 < length <= settings.TRAFFIC_CAPTURE_MAX_BODY:
+            return None
+        try:
+            body = json.loads(request.body)
+        except ValueError:
+            return None
+        return scrub(body)
+
+    @staticmethod
+    def anonymize(request):
+        """Хеш id пользователя; заголовок Authorization не записывается"""
+        user_id = None
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            user_id = user.pk
+        else:
+            scheme, _, key = request.META.get(
+                'HTTP_AUTHORIZATION', '').partition(' ')
+            if scheme.lower() == 'token' and key:
+                user_id = Token.objects.filter(key=key.strip()).values_list(
+                    'user_id', flat=True).first()
+        if user_id is None:
+            return None
+        return hmac.new(settings.SECRET_KEY.encode(), str(user_id).encode(),
+                        hashlib.sha256).hexdigest()[:16]
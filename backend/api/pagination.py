@@ -1,6 +1,81 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+from datetime import datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
 
 
 class Paginator(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+
+
+class LeaderboardPaginator(CursorPagination):
+    """Страницы рейтинга по курсору: без COUNT и OFFSET"""
+    page_size_query_param = 'limit'
+    page_size = 6
+    max_page_size = 100
+    ordering = 'leaderboard_rank'
+
+
+class TimelinePaginator(CursorPagination):
+    """Страницы ленты по курсору (pub_date, id): без COUNT и OFFSET.
+
+    Лента собирается из двух источников, поэтому вместо queryset
+    принимает объект с методом get_positions(position, size) и отдаёт
+    id рецептов страницы.
+    """
+    page_size_query_param = 'limit'
+    page_size = 6
+    max_page_size = 100
+
+    def paginate_queryset(self, timeline, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        positions = timeline.get_positions(
+            cursor and self.parse_position(cursor.position),
+            self.page_size + 1)
+        self.next_position = None
+        if len(positions) > self.page_size:
+            pub_date, recipe_id = positions[self.page_size - 1]
+            self.next_position = f'{pub_date.isoformat()}|{recipe_id}'
+        return [recipe_id for _, recipe_id in positions[:self.page_size]]
+
+    def parse_position(self, position):
+        try:
+            pub_date, recipe_id = position.rsplit('|', 1)
+            return datetime.fromisoformat(pub_date), int(recipe_id)
+        except (AttributeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False,
+                                         position=self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict((
+            ('next', self.get_next_link()),
+            ('results', data),
+        )))
+
+
+class IdSequence:
+    """Ленивый список объектов по id, вычисляемым для каждой страницы"""
+
+    def __init__(self, queryset, count, get_ids):
+        self.queryset = queryset
+        self.count = count
+        self.get_ids = get_ids
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        ids = self.get_ids(item.start or 0, item.stop)
+        objects = self.queryset.in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
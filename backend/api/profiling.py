@@ -0,0 +1,146 @@
+import signal
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection
+from rest_framework import serializers
+
+
+class FieldStats:
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.calls = 0
+        self.total = 0.0
+        self.own = 0.0
+        self.queries = 0
+
+
+def field_path(field):
+    """Путь поля от корневого сериализатора"""
+    names = []
+    node = field
+    while node.parent is not None:
+        if node.field_name:
+            names.append(node.field_name)
+        node = node.parent
+    if isinstance(node, serializers.ListSerializer):
+        node = node.child
+    names.append(type(node).__name__)
+    return tuple(reversed(names))
+
+
+class FieldProfiler:
+    """Время и запросы к БД по каждому полю сериализаторов.
+
+    Пока профилировщик активен, поля всех сериализаторов при обходе
+    оборачиваются замерами get_attribute и to_representation; время
+    вложенных полей вычитается из собственного времени родителя.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.stack = []
+        self.queries = 0
+
+    @contextmanager
+    def activate(self):
+        readable_fields = serializers.Serializer._readable_fields
+
+        def instrumented_fields(serializer):
+            for field in readable_fields.fget(serializer):
+                self.instrument(field)
+                yield field
+
+        serializers.Serializer._readable_fields = property(
+            instrumented_fields)
+        try:
+            with connection.execute_wrapper(self.count_query):
+                yield self
+        finally:
+            serializers.Serializer._readable_fields = readable_fields
+
+    def instrument(self, field):
+        if '_profiled_path' in field.__dict__:
+            return
+        path = field_path(field)
+        if self.stack and len(path) == 2:
+            # Сериализатор, созданный внутри метода поля
+            path = self.stack[-1][0] + path[1:]
+        field._profiled_path = path
+        if path not in self.stats:
+            self.stats[path] = FieldStats(type(field).__name__)
+        field.get_attribute = self.timed(field.get_attribute, path, True)
+        field.to_representation = self.timed(
+            field.to_representation, path, False)
+
+    def timed(self, method, path, is_call):
+        stats = self.stats[path]
+
+        def wrapper(*args, **kwargs):
+            self.stack.append([path, 0.0])
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                nested = self.stack.pop()[1]
+                stats.calls += is_call
+                stats.total += elapsed
+                stats.own += elapsed - nested
+                if self.stack:
+                    self.stack[-1][1] += elapsed
+        return wrapper
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        if self.stack:
+            self.stats[self.stack[-1][0]].queries += 1
+        return execute(sql, params, many, context)
+
+    def collapsed(self):
+        """Дерево полей в формате collapsed stacks, вес в микросекундах"""
+        for path, stats in sorted(self.stats.items()):
+            weight = round(stats.own * 1e6)
+            if weight:
+                yield f'{";".join(path)} {weight}'
+
+
+class StackSampler:
+    """Семплирующий профилировщик стеков Python по таймеру.
+
+    Режим wall учитывает ожидание БД, cpu — только процессорное время.
+    Работает в главном потоке на Unix.
+    """
+
+    TIMERS = {
+        'wall': (signal.ITIMER_REAL, signal.SIGALRM),
+        'cpu': (signal.ITIMER_PROF, signal.SIGPROF),
+    }
+
+    def __init__(self, interval, clock='wall'):
+        self.interval = interval
+        self.timer, self.signal = self.TIMERS[clock]
+        self.stacks = Counter()
+
+    def __enter__(self):
+        self.previous = signal.signal(self.signal, self.sample)
+        signal.setitimer(self.timer, self.interval, self.interval)
+        return self
+
+    def __exit__(self, *exc_info):
+        signal.setitimer(self.timer, 0)
+        signal.signal(self.signal, self.previous)
+
+    def sample(self, signum, frame):
+        names = []
+        while frame is not None:
+            names.append(f'{frame.f_globals.get("__name__", "?")}:'
+                         f'{frame.f_code.co_name}')
+            frame = frame.f_back
+        self.stacks[';'.join(reversed(names))] += 1
+
+    def collapsed(self):
+        for stack, count in self.stacks.most_common():
+            yield f'{stack} {count}'
@@ -1,5 +1,6 @@
 from django.db.models import F
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from drf_extra_fields.fields import Base64ImageField
@@ -7,11 +8,41 @@ from django.core.exceptions import ValidationError
 
 from users.models import User
 from recipes.models import (Ingredient, Tag, Recipe,
-                            Products, Favorites, Follow, ShoppingList)
+                            Products, Favorites, Follow, ShoppingList,
+                            ShoppingListExport)
+from recipes.exports import pdf_available
 from api.constants import MIN_VAL, MAX_VAL
 
 
-class OutputUsersSerializer(UserSerializer):
+def sparse_field_names(request, field_names):
+    """Поля ответа с учётом параметров fields и omit запроса"""
+    names = set(field_names)
+    fields = request.query_params.get('fields')
+    omit = request.query_params.get('omit')
+    if fields:
+        names &= set(fields.split(','))
+    if omit:
+        names -= set(omit.split(','))
+    return names
+
+
+class SparseFieldsMixin:
+    """Отбор полей верхнего уровня по параметрам fields и omit"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if request is None or parent is not None:
+            return fields
+        names = sparse_field_names(request, fields)
+        return {name: field for name, field in fields.items()
+                if name in names}
+
+
+class OutputUsersSerializer(SparseFieldsMixin, UserSerializer):
     """Вывод пользователей"""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -25,9 +56,11 @@ class OutputUsersSerializer(UserSerializer):
         if not request:
             return False
         user = request.user
-        if user.is_authenticated:
-            return user.follower.filter(author=obj).exists()
-        return False
+        if not user.is_authenticated:
+            return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return user.follower.filter(author=obj).exists()
 
 
 class UserCreateSerializer(UserCreateSerializer):
@@ -38,10 +71,9 @@ class UserCreateSerializer(UserCreateSerializer):
                   'first_name', 'last_name', 'password')
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор подписок"""
-    recipes_count = serializers.IntegerField(source='recipes.count',
-                                             read_only=True)
+    recipes_count = serializers.SerializerMethodField(read_only=True)
     is_subscribed = serializers.SerializerMethodField(read_only=True)
     recipes = serializers.SerializerMethodField(read_only=True)
 
@@ -52,7 +84,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
                   'recipes_count', 'recipes',)
 
     def get_recipes(self, obj):
-        request = self.context['request'].user
+        request = self.context['request']
         limit = request.GET.get('recipes_limit')
         recipes = obj.recipes.all()
         if limit:
@@ -68,9 +100,13 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
         if not request or not user.is_authenticated:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return obj.following.filter(user=user).exists()
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
 
@@ -79,7 +115,8 @@ class SubscribeSerializer(serializers.Serializer):
 
     def validate(self, data):
         user = self.context['request'].user
-        author = get_object_or_404(User, pk=self.context['id'])
+        author = get_object_or_404(User, is_hidden=False,
+                                   pk=self.context['id'])
         if user == author:
             raise serializers.ValidationError()
         if user.follower.filter(author=author).exists():
@@ -138,7 +175,7 @@ class ProductsGetSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeGetSerializer(serializers.ModelSerializer):
+class RecipeGetSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Список рецептов"""
     author = OutputUsersSerializer(
         read_only=True,
@@ -164,12 +201,16 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return request.user.user_favorites.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return request.user.shopping_list.filter(recipe=obj).exists()
 
 
@@ -314,3 +355,25 @@ class ShoppingListSerializer(serializers.Serializer):
         return ShortRecipeSerializer(
             instance.recipe,
             context={'request': self.context.get('request')}).data
+
+
+class ShoppingListExportSerializer(serializers.ModelSerializer):
+    """Задания на выгрузку списка покупок"""
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ShoppingListExport
+        fields = ('id', 'file_format', 'status', 'error',
+                  'created', 'finished', 'download')
+        read_only_fields = ('status', 'error', 'created', 'finished')
+
+    def validate_file_format(self, value):
+        if value == ShoppingListExport.PDF and not pdf_available():
+            raise serializers.ValidationError('Формат PDF недоступен')
+        return value
+
+    def get_download(self, obj):
+        if obj.status != ShoppingListExport.DONE:
+            return None
+        return self.context['request'].build_absolute_uri(
+            reverse('shopping-list-exports-download', args=(obj.pk,)))
@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Recipe, Tag
+from api.cache import invalidate_ingredients, invalidate_tags
+from api.events import get_broker, recipe_event
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def reset_tags_cache(sender, **kwargs):
+    invalidate_tags()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def reset_ingredients_cache(sender, **kwargs):
+    invalidate_ingredients()
+
+
+@receiver(post_save, sender=Recipe)
+def publish_recipe(sender, instance, created, **kwargs):
+    if created:
+        event = recipe_event(instance)
+        transaction.on_commit(
+            lambda: get_broker().publish(instance.author_id, event))
@@ -0,0 +1,101 @@
+import asyncio
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Follow, Recipe
+from users.models import User
+from api.events import get_broker, read_ticket, recipe_event
+
+
+async def get_user(request):
+    """Пользователь по токену из заголовка или по билету из ticket.
+
+    EventSource в браузере не умеет передавать заголовки, поэтому
+    он подключается с билетом из /api/users/events_ticket/.
+    """
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Token '):
+        token = await Token.objects.select_related('user').filter(
+            key=header.split(' ', 1)[1], user__is_active=True).afirst()
+        return token.user if token else None
+    user_id = read_ticket(request.GET.get('ticket', ''))
+    if user_id is None:
+        return None
+    return await User.objects.filter(pk=user_id, is_active=True).afirst()
+
+
+def format_event(event):
+    return (f'id: {event["id"]}\nevent: recipe\n'
+            f'data: {json.dumps(event, ensure_ascii=False)}\n\n')
+
+
+async def missed_events(author_ids, last_event_id):
+    """Рецепты, опубликованные, пока клиент переподключался"""
+    if last_event_id is None:
+        return []
+    since = timezone.now() - timedelta(seconds=settings.EVENTS_POLL_OVERLAP)
+    return [recipe_event(recipe) async for recipe in Recipe.objects.filter(
+        author_id__in=author_ids, pk__gt=last_event_id,
+        pub_date__gte=since).only(
+            'id', 'name', 'author_id', 'pub_date').order_by('pk')[
+                :settings.EVENTS_QUEUE_SIZE]]
+
+
+async def event_stream(author_ids, last_event_id):
+    """Поток событий с ограниченным временем жизни.
+
+    ASGIHandler не сообщает потоку об отключении клиента, а send() в
+    закрытое соединение не падает. Поэтому поток сам завершается через
+    EVENTS_MAX_LIFETIME секунд и освобождает подписку; EventSource
+    переподключается с Last-Event-ID и получает пропущенные рецепты.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.EVENTS_MAX_LIFETIME
+    broker = get_broker()
+    subscription = broker.subscribe(author_ids)
+    try:
+        yield f'retry: {settings.EVENTS_RETRY_MS}\n\n'
+        sent = set()
+        for event in await missed_events(author_ids, last_event_id):
+            sent.add(event['id'])
+            yield format_event(event)
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(),
+                    min(settings.EVENTS_HEARTBEAT, remaining))
+            except asyncio.TimeoutError:
+                yield ': heartbeat\n\n'
+                continue
+            if event['id'] not in sent:
+                yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def recipe_events(request):
+    """SSE-поток новых рецептов авторов из подписок пользователя"""
+    user = await get_user(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Учетные данные не были предоставлены.'}, status=401)
+    try:
+        last_event_id = int(request.headers['Last-Event-ID'])
+    except (KeyError, ValueError):
+        last_event_id = None
+    author_ids = [author_id async for author_id in Follow.objects.filter(
+        user=user).values_list('author_id', flat=True)]
+    response = StreamingHttpResponse(
+        event_stream(author_ids, last_event_id),
+        content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,78 @@
+import base64
+import tempfile
+from io import BytesIO
+
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import Favorites, Ingredient, Recipe, Tag
+from recipes.tests.utils import create_recipe, create_user
+
+
+def image_data():
+    buffer = BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class IdempotencyKeyTest(TestCase):
+    """Повтор с тем же ключом получает исходный ответ"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.recipe = create_recipe(create_user())
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def favorite(self, recipe, key):
+        return self.client.post(f'/api/recipes/{recipe.pk}/favorite/',
+                                HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_original_response(self):
+        first = self.favorite(self.recipe, 'favorite-1')
+        second = self.favorite(self.recipe, 'favorite-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Favorites.objects.filter(user=self.user).count(), 1)
+
+    def test_new_key_runs_request_again(self):
+        self.favorite(self.recipe, 'favorite-1')
+        self.assertEqual(self.favorite(self.recipe, 'favorite-2').status_code,
+                         400)
+
+    def test_key_reused_for_other_request(self):
+        self.favorite(self.recipe, 'favorite-1')
+        other = create_recipe(self.recipe.author)
+        self.assertEqual(self.favorite(other, 'favorite-1').status_code, 422)
+
+    def test_keys_are_per_user(self):
+        self.favorite(self.recipe, 'favorite-1')
+        self.client.force_authenticate(create_user())
+        response = self.favorite(self.recipe, 'favorite-1')
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(response.status_code, 201)
+
+    def test_replayed_create_makes_one_recipe(self):
+        tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        ingredient = Ingredient.objects.create(name='Соль',
+                                               measurement_unit='г')
+        data = {'name': 'Омлет', 'text': 'Взбить', 'cooking_time': 5,
+                'image': image_data(), 'tags': [tag.pk],
+                'ingredients': [{'id': ingredient.pk, 'amount': 2}]}
+        with tempfile.TemporaryDirectory() as media, \
+                override_settings(MEDIA_ROOT=media):
+            responses = [self.client.post('/api/recipes/', data,
+                                          format='json',
+                                          HTTP_IDEMPOTENCY_KEY='create-1')
+                         for _ in range(2)]
+        self.assertEqual([response.status_code for response in responses],
+                         [201, 201])
+        self.assertEqual(responses[1].data, responses[0].data)
+        self.assertEqual(Recipe.objects.filter(author=self.user).count(), 1)
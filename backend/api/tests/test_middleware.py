@@ -0,0 +1,25 @@
+import json
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api.middleware import TrafficCaptureMiddleware
+
+
+@override_settings(TRAFFIC_CAPTURE_MAX_BODY=100,
+                   DATA_UPLOAD_MAX_MEMORY_SIZE=200)
+class CaptureBodyTest(SimpleTestCase):
+
+    def post(self, data):
+        return RequestFactory().post('/api/recipes/', json.dumps(data),
+                                     content_type='application/json')
+
+    def test_small_body_is_scrubbed(self):
+        request = self.post({'name': 'Борщ', 'email': 'a@example.com'})
+        self.assertEqual(TrafficCaptureMiddleware.get_body(request),
+                         {'name': 'Борщ', 'email': '***'})
+
+    def test_large_body_is_not_read(self):
+        request = self.post({'image': 'x' * 500})
+        self.assertIsNone(TrafficCaptureMiddleware.get_body(request))
+        # Тело осталось непрочитанным, его разберёт сам view
+        self.assertFalse(hasattr(request, '_body'))
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.changelog import compact
+from recipes.models import Favorites, Follow, ShoppingList
+from recipes.tests.utils import create_recipe, create_user
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncTest(TestCase):
+    """Дельты избранного, корзины и подписок с версии since"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.author = create_user()
+        cls.recipe = create_recipe(cls.author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since):
+        response = self.client.get(f'/api/sync/?since={since}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_changes_since_version(self):
+        Favorites.objects.create(user=self.user, recipe=self.recipe)
+        first = self.sync(0)
+        self.assertEqual(first['favorites'],
+                         {'added': [self.recipe.pk], 'removed': []})
+
+        Favorites.objects.filter(user=self.user).delete()
+        ShoppingList.objects.create(user=self.user, recipe=self.recipe)
+        Follow.objects.create(user=self.user, author=self.author)
+        delta = self.sync(first['version'])
+        self.assertGreater(delta['version'], first['version'])
+        self.assertEqual(delta['favorites'],
+                         {'added': [], 'removed': [self.recipe.pk]})
+        self.assertEqual(delta['shopping_cart'],
+                         {'added': [self.recipe.pk], 'removed': []})
+        self.assertEqual(delta['subscriptions'],
+                         {'added': [self.author.pk], 'removed': []})
+
+        unchanged = self.sync(delta['version'])
+        self.assertEqual(unchanged['version'], delta['version'])
+        self.assertEqual(unchanged['favorites'],
+                         {'added': [], 'removed': []})
+
+    def test_last_action_wins(self):
+        Favorites.objects.create(user=self.user, recipe=self.recipe)
+        Favorites.objects.filter(user=self.user).delete()
+        self.assertEqual(self.sync(0)['favorites'],
+                         {'added': [], 'removed': [self.recipe.pk]})
+
+    def test_other_users_changes_are_hidden(self):
+        Favorites.objects.create(user=self.author, recipe=self.recipe)
+        self.assertEqual(self.sync(0)['favorites'],
+                         {'added': [], 'removed': []})
+
+    @override_settings(SYNC_SETTLE_SECONDS=60)
+    def test_fresh_changes_do_not_advance_version(self):
+        Favorites.objects.create(user=self.user, recipe=self.recipe)
+        data = self.sync(0)
+        self.assertEqual(data['version'], 0)
+        self.assertEqual(data['favorites']['added'], [self.recipe.pk])
+
+    def test_compacted_version_requires_resync(self):
+        Favorites.objects.create(user=self.user, recipe=self.recipe)
+        compact(timezone.now() + timedelta(seconds=1), batch_size=100)
+        self.assertTrue(self.sync(0)['resync'])
+
+    def test_invalid_since(self):
+        response = self.client.get('/api/sync/?since=-1')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,66 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import throttling
+from api.constants import RECIPES_BATCH_LIMIT
+
+THROTTLE = {
+    'STORE': 'api.throttling.LocMemBucketStore',
+    'USER_CAPACITY': 2,
+    'USER_RATE': 0.001,
+    'IP_CAPACITY': 2,
+    'IP_RATE': 0.001,
+}
+
+
+@override_settings(THROTTLE=THROTTLE)
+class ClientBucketsTest(TestCase):
+    """Клиенты за gateway получают отдельные корзины"""
+
+    url = '/api/tags/'
+
+    def setUp(self):
+        throttling._store = None
+        self.addCleanup(setattr, throttling, '_store', None)
+
+    def get(self, client_ip):
+        # Так запрос выглядит после nginx: REMOTE_ADDR - адрес gateway
+        return APIClient().get(self.url, REMOTE_ADDR='172.18.0.5',
+                               HTTP_X_FORWARDED_FOR=client_ip)
+
+    def test_exhausted_client_is_throttled(self):
+        for _ in range(THROTTLE['IP_CAPACITY']):
+            self.assertEqual(self.get('203.0.113.1').status_code, 200)
+        self.assertEqual(self.get('203.0.113.1').status_code, 429)
+
+    def test_other_client_keeps_own_bucket(self):
+        for _ in range(THROTTLE['IP_CAPACITY'] + 1):
+            self.get('203.0.113.1')
+        self.assertEqual(self.get('203.0.113.2').status_code, 200)
+
+    def test_spoofed_forwarded_for_is_ignored(self):
+        # nginx дописывает реальный адрес в конец заголовка
+        for _ in range(THROTTLE['IP_CAPACITY']):
+            self.get('198.51.100.7, 203.0.113.1')
+        self.assertEqual(
+            self.get('198.51.100.8, 203.0.113.1').status_code, 429)
+
+
+@override_settings(THROTTLE=THROTTLE)
+class BatchCostTest(TestCase):
+    """Пачка рецептов по id стоит столько же, сколько запросы по одному"""
+
+    def setUp(self):
+        throttling._store = None
+        self.addCleanup(setattr, throttling, '_store', None)
+        self.client = APIClient()
+
+    def test_batch_is_charged_per_id(self):
+        response = self.client.get('/api/recipes/?ids=1,2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/tags/').status_code, 429)
+
+    def test_batch_over_limit_is_rejected(self):
+        ids = ','.join(['1'] * (RECIPES_BATCH_LIMIT + 1))
+        response = self.client.get(f'/api/recipes/?ids={ids}')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,156 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+from api.constants import (DEEP_PAGE_ROWS, THROTTLE_LOCK_POLL_INTERVAL,
+                           THROTTLE_LOCK_TIMEOUT, THROTTLE_LOCK_WAIT,
+                           THROTTLE_SWEEP_INTERVAL)
+
+
+def refill(state, capacity, rate, now):
+    tokens, updated = state or (capacity, now)
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+def take(buckets, states, now):
+    """Списание со всех корзин сразу или ни с одной.
+
+    Отдаёт новые состояния корзин и время ожидания; при нехватке
+    токенов хотя бы в одной корзине состояния не меняются.
+    """
+    remaining = []
+    wait = 0
+    for (key, cost, capacity, rate), state in zip(buckets, states):
+        tokens = refill(state, capacity, rate, now)
+        if tokens < cost:
+            wait = max(wait, (cost - tokens) / rate)
+        remaining.append((tokens - cost, now))
+    return (None if wait else remaining), wait
+
+
+class LocMemBucketStore:
+    """Корзины токенов в памяти процесса.
+
+    Корзина, которая успела наполниться, ничем не отличается от
+    отсутствующей, поэтому такие корзины периодически удаляются.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.swept = time.monotonic()
+
+    def consume(self, buckets):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.swept >= THROTTLE_SWEEP_INTERVAL:
+                self.sweep(now)
+            states, wait = take(buckets, [
+                self.buckets[key][:2] if key in self.buckets else None
+                for key, *_ in buckets], now)
+            if states:
+                for (key, _, capacity, rate), (tokens, updated) in zip(
+                        buckets, states):
+                    # Третий элемент - момент, когда корзина наполнится
+                    self.buckets[key] = (tokens, updated,
+                                         updated + (capacity - tokens) / rate)
+        return wait
+
+    def sweep(self, now):
+        self.buckets = {key: state for key, state in self.buckets.items()
+                        if state[2] > now}
+        self.swept = now
+
+
+class CacheBucketStore:
+    """Корзины токенов в общем кэше Django для нескольких воркеров.
+
+    Чтение и запись корзин идут под блокировкой на cache.add, которая
+    атомарна в Redis, Memcached и кэше в БД.
+    """
+
+    def consume(self, buckets):
+        keys = [f'throttle:{key}' for key, *_ in buckets]
+        locks = [f'{key}:lock' for key in sorted(keys)]
+        acquired = []
+        try:
+            for lock in locks:
+                if not self.acquire(lock):
+                    return THROTTLE_LOCK_WAIT
+                acquired.append(lock)
+            now = time.time()
+            stored = cache.get_many(keys)
+            states, wait = take(buckets, [stored.get(key) for key in keys],
+                                now)
+            if states:
+                for key, state, (_, _, capacity, rate) in zip(
+                        keys, states, buckets):
+                    cache.set(key, state, math.ceil(capacity / rate) + 1)
+            return wait
+        finally:
+            cache.delete_many(acquired)
+
+    @staticmethod
+    def acquire(lock):
+        deadline = time.monotonic() + THROTTLE_LOCK_WAIT
+        while not cache.add(lock, 1, THROTTLE_LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(THROTTLE_LOCK_POLL_INTERVAL)
+        return True
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = import_string(settings.THROTTLE['STORE'])()
+    return _store
+
+
+def page_cost(request, base=1, rows_per_item=1):
+    """Стоимость страницы растёт с её глубиной и размером"""
+    try:
+        page = int(request.query_params.get('page', 1))
+        limit = int(request.query_params.get('limit', 6))
+    except ValueError:
+        return base
+    rows = max(page, 1) * max(limit, 1) * rows_per_item
+    return base + rows // DEEP_PAGE_ROWS
+
+
+class CostThrottle(BaseThrottle):
+    """Ограничение запросов по стоимости действия.
+
+    Стоимость задаётся атрибутом throttle_cost вьюсета или action,
+    либо методом get_throttle_cost(request).
+    """
+
+    def get_cost(self, request, view):
+        get_throttle_cost = getattr(view, 'get_throttle_cost', None)
+        if get_throttle_cost is not None:
+            return get_throttle_cost(request)
+        return getattr(view, 'throttle_cost', 1)
+
+    def allow_request(self, request, view):
+        config = settings.THROTTLE
+        buckets = [(f'ip:{self.get_ident(request)}',
+                    config['IP_CAPACITY'], config['IP_RATE'])]
+        if request.user and request.user.is_authenticated:
+            buckets.append((f'user:{request.user.pk}',
+                            config['USER_CAPACITY'], config['USER_RATE']))
+        cost = self.get_cost(request, view)
+        self.wait_time = get_store().consume(
+            [(key, min(cost, capacity), capacity, rate)
+             for key, capacity, rate in buckets])
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time
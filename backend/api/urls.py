@@ -1,15 +1,19 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import IngredientViewSet, TagViewSet, RecipeViewSet, UserViewSet
+from api.views import (IngredientViewSet, TagViewSet, RecipeViewSet,
+                       ShoppingListExportViewSet, SyncViewSet, UserViewSet)
 
 
 router = DefaultRouter()
 
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('tags', TagViewSet, basename='tags')
+router.register('recipes/shopping_cart/exports', ShoppingListExportViewSet,
+                basename='shopping-list-exports')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('users', UserViewSet, basename='users')
+router.register('sync', SyncViewSet, basename='sync')
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
@@ -1,24 +1,44 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import (Count, Exists, F, OuterRef, Prefetch, Q,
+                              Sum, Value)
+from django.http import FileResponse, HttpResponse
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, viewsets, mixins
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 
 from recipes.models import (Ingredient, Tag, Recipe, Products, Favorites,
-                            ShoppingList,)
+                            Follow, ShoppingList, ShoppingListExport)
+from recipes.exports import requeue_stale_exports, submit_export
+from recipes.changelog import changes_since
+from recipes.columnar import get_recipe_index
+from recipes.deletion import schedule_deletion
+from recipes.feed import Timeline
+from recipes.similarity import find_similar
 from api.serializers import (FavoritesSerializer, IngredientSerializer,
                              RecipeCreateSerializer, RecipeGetSerializer,
                              ChangePasswordSerializer, ShoppingListSerializer,
                              SubscribeSerializer, SubscriptionSerializer,
                              TagSerializer, UserCreateSerializer,
-                             OutputUsersSerializer, ShortRecipeSerializer)
-from api.pagination import Paginator
+                             OutputUsersSerializer, ShortRecipeSerializer,
+                             ShoppingListExportSerializer,
+                             sparse_field_names)
+from api.pagination import (IdSequence, LeaderboardPaginator, Paginator,
+                            TimelinePaginator)
 from api.filters import NameIngredientsFilter, RecipeFilter
+from api.cache import get_ingredients, get_tags
+from api.events import issue_ticket
+from api.idempotency import idempotent
+from api.constants import (MAX_SIMILAR_LIMIT, RECIPES_BATCH_LIMIT,
+                           RECIPE_WRITE_COST,
+                           SHOPPING_CART_DOWNLOAD_COST,
+                           SIMILAR_RECIPES_LIMIT,
+                           SUBSCRIPTION_RECIPES_ESTIMATE)
+from api.throttling import page_cost
 
 
 User = get_user_model()
@@ -33,6 +53,11 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = NameIngredientsFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('name'):
+            return super().list(request, *args, **kwargs)
+        return Response(get_ingredients())
+
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     """Вьюсет для тэгов"""
@@ -41,6 +66,9 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (AllowAny,)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return Response(get_tags())
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Вьюсет рецептов"""
@@ -53,10 +81,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
     serializer_action_classes = {
         'list': RecipeGetSerializer,
         'retrieve': RecipeGetSerializer,
+        'popular': RecipeGetSerializer,
+        'trending': RecipeGetSerializer,
+        'timeline': RecipeGetSerializer,
+        'similar': ShortRecipeSerializer,
         'favorite': FavoritesSerializer,
         'shopping_cart': ShoppingListSerializer,
     }
 
+    throttle_cost = 1
+    paginated_actions = ('list', 'popular', 'trending', 'timeline')
+    read_actions = paginated_actions + ('retrieve',)
+    indexed_params = {'tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                      'cooking_time_min', 'cooking_time_max',
+                      'pub_date_after', 'pub_date_before',
+                      'page', 'limit', 'fields', 'omit'}
+
     def get_serializer_class(self):
         """Выбор сериализатора"""
         try:
@@ -64,23 +104,154 @@ class RecipeViewSet(viewsets.ModelViewSet):
         except Exception:
             return RecipeCreateSerializer
 
+    def get_queryset(self):
+        """Подгрузка связей и флагов только для запрошенных полей"""
+        queryset = super().get_queryset()
+        if self.action not in self.read_actions:
+            return queryset
+        fields = sparse_field_names(self.request,
+                                    RecipeGetSerializer.Meta.fields)
+        if 'author' in fields:
+            queryset = queryset.select_related('author')
+        if 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if 'ingredients' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'recipe_ingredients',
+                queryset=Products.objects.select_related('ingredient')))
+        user = self.request.user
+        if user.is_authenticated:
+            if 'is_favorited' in fields:
+                queryset = queryset.annotate(is_favorited=Exists(
+                    Favorites.objects.filter(user=user,
+                                             recipe=OuterRef('pk'))))
+            if 'is_in_shopping_cart' in fields:
+                queryset = queryset.annotate(is_in_shopping_cart=Exists(
+                    ShoppingList.objects.filter(user=user,
+                                                recipe=OuterRef('pk'))))
+        return queryset
+
+    def get_throttle_cost(self, request):
+        """Стоимость запроса для CostThrottle"""
+        if self.action == 'list' and 'ids' in request.query_params:
+            # Пачка стоит как запросы каждого рецепта по отдельности
+            return self.throttle_cost * min(
+                request.query_params['ids'].count(',') + 1,
+                RECIPES_BATCH_LIMIT)
+        if self.action in self.paginated_actions:
+            return page_cost(request, self.throttle_cost)
+        if self.action in ('create', 'partial_update'):
+            return RECIPE_WRITE_COST
+        return self.throttle_cost
+
+    def list(self, request, *args, **kwargs):
+        if 'ids' in request.query_params:
+            return self.list_by_ids(request)
+        index = get_recipe_index()
+        if index is not None and set(
+                request.query_params) <= self.indexed_params:
+            return self.list_from_index(request, index)
+        return super().list(request, *args, **kwargs)
+
+    def list_from_index(self, request, index):
+        """Список по индексу рецептов: из БД читается только страница"""
+        queryset = self.get_queryset()
+        filterset = self.filterset_class(request.query_params, queryset,
+                                         request=request)
+        if not filterset.is_valid():
+            return super().list(request)
+        ids = filterset.filter_index(index)
+        page = self.paginate_queryset(IdSequence(
+            queryset, lambda: len(ids),
+            lambda start, stop: ids[start:stop].tolist()))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def list_by_ids(self, request):
+        """Рецепты по списку id в исходном порядке"""
+        values = [pk for pk in request.query_params['ids'].split(',') if pk]
+        if len(values) > RECIPES_BATCH_LIMIT:
+            raise ValidationError(
+                {'ids': f'Не больше {RECIPES_BATCH_LIMIT} рецептов'})
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in values))
+        except ValueError:
+            raise ValidationError({'ids': 'Ожидается список чисел'})
+        recipes = self.filter_queryset(self.get_queryset()).in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True)
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in recipes],
+        })
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     def perform_update(self, serializer):
         serializer.save(author=self.request.user)
 
+    def perform_destroy(self, instance):
+        schedule_deletion(instance)
+
+    def leaderboard(self, rank_field):
+        """Страница рейтинга: чтение по уникальному индексу места"""
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            popularity__isnull=False).annotate(
+                leaderboard_rank=F(f'popularity__{rank_field}'))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=('get',),
+            pagination_class=LeaderboardPaginator)
+    def popular(self, request):
+        return self.leaderboard('total_rank')
+
+    @action(detail=False, methods=('get',),
+            pagination_class=LeaderboardPaginator)
+    def trending(self, request):
+        return self.leaderboard('score_rank')
+
+    @action(detail=False, methods=('get',),
+            permission_classes=(IsAuthenticated,),
+            pagination_class=TimelinePaginator)
+    def timeline(self, request):
+        ids = self.paginate_queryset(Timeline(request.user))
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=('get',))
+    def similar(self, request, pk=None):
+        recipe = self.get_object()
+        try:
+            limit = int(request.query_params.get(
+                'limit', SIMILAR_RECIPES_LIMIT))
+        except ValueError:
+            limit = SIMILAR_RECIPES_LIMIT
+        ids = find_similar(recipe.pk, min(max(limit, 1), MAX_SIMILAR_LIMIT))
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True)
+        return Response(serializer.data)
+
     @action(methods=('post', 'delete',), detail=True,
             serializer_class=FavoritesSerializer,
             permission_classes=(IsAuthenticated,),)
+    @idempotent
     def favorite(self, request, **kwargs):
         recipe = get_object_or_404(Recipe, id=kwargs['pk'])
         if request.method == 'POST':
-            serializer = ShortRecipeSerializer(recipe, data=request.data,
-                                               context={'request': request})
-            serializer.is_valid(raise_exception=True)
             if not recipe.favorites.filter(user=request.user).exists():
                 Favorites.objects.create(user=request.user, recipe=recipe)
+                serializer = ShortRecipeSerializer(
+                    recipe, context={'request': request})
                 return Response(serializer.data,
                                 status=status.HTTP_201_CREATED)
             return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -93,6 +264,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             detail=True,
             serializer_class=ShoppingListSerializer,
             permission_classes=(IsAuthenticated,),)
+    @idempotent
     def shopping_cart(self, request, pk=None):
 
         if self.request.method == 'POST':
@@ -117,7 +289,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(detail=False,
             methods=('get',),
-            permission_classes=(IsAuthenticated,),)
+            permission_classes=(IsAuthenticated,),
+            throttle_cost=SHOPPING_CART_DOWNLOAD_COST,)
     def download_shopping_cart(self, request):
         shopping_cart = request.user.shopping_list.filter(
             user=self.request.user)
@@ -131,7 +304,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
 def shopping_list_info(shopping_list):
     recipes = shopping_list.values_list('recipe_id', flat=True)
     shop_list = Products.objects.filter(
-        recipe__in=recipes).values('ingredient').annotate(
+        recipe__in=recipes, recipe__is_hidden=False).values(
+            'ingredient').annotate(
             amount=Sum('amount'))
     current_list = 'Список покупок'
     for unit in shop_list:
@@ -145,7 +319,7 @@ def shopping_list_info(shopping_list):
 class UserViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
                   mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     """Вьюсет работы с пользователем"""
-    queryset = User.objects.all()
+    queryset = User.objects.filter(is_hidden=False)
     filter_backends = (DjangoFilterBackend, filters.SearchFilter)
     search_fields = ('username',)
     filterset_fields = ('username',)
@@ -157,18 +331,68 @@ class UserViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
         'subscribe': SubscribeSerializer,
     }
 
+    throttle_cost = 1
+
     def get_serializer_class(self):
         try:
             return self.serializer_action_classes[self.action]
         except Exception:
             return UserCreateSerializer
 
+    def get_queryset(self):
+        """Флаг подписки только если он запрошен"""
+        queryset = super().get_queryset()
+        user = self.request.user
+        if self.action == 'subscriptions':
+            return self.get_subscriptions_queryset(queryset, user)
+        if (self.action in ('list', 'retrieve') and user.is_authenticated
+                and 'is_subscribed' in sparse_field_names(
+                    self.request, OutputUsersSerializer.Meta.fields)):
+            queryset = queryset.annotate(is_subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef('pk'))))
+        return queryset
+
+    def get_subscriptions_queryset(self, queryset, user):
+        fields = sparse_field_names(self.request,
+                                    SubscriptionSerializer.Meta.fields)
+        queryset = queryset.filter(
+            following__user=user).order_by('username')
+        if 'is_subscribed' in fields:
+            queryset = queryset.annotate(is_subscribed=Value(True))
+        if 'recipes_count' in fields:
+            queryset = queryset.annotate(recipes_count=Count(
+                'recipes', filter=Q(recipes__is_hidden=False)))
+        if 'recipes' in fields and not self.request.query_params.get(
+                'recipes_limit'):
+            queryset = queryset.prefetch_related('recipes')
+        return queryset
+
+    def get_throttle_cost(self, request):
+        """Стоимость запроса для CostThrottle"""
+        if self.action == 'list':
+            return page_cost(request, self.throttle_cost)
+        if self.action == 'subscriptions':
+            try:
+                recipes_limit = int(request.query_params['recipes_limit'])
+            except (KeyError, ValueError):
+                recipes_limit = SUBSCRIPTION_RECIPES_ESTIMATE
+            return page_cost(request, self.throttle_cost,
+                             rows_per_item=1 + max(recipes_limit, 0))
+        return self.throttle_cost
+
     @action(methods=('get',), detail=False,
             permission_classes=(IsAuthenticated,),)
     def me(self, request):
-        serializer = OutputUsersSerializer(request.user)
+        serializer = OutputUsersSerializer(request.user,
+                                           context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(methods=('post',), detail=False,
+            permission_classes=(IsAuthenticated,),)
+    def events_ticket(self, request):
+        return Response({'ticket': issue_ticket(request.user)},
+                        status=status.HTTP_201_CREATED)
+
     @action(methods=('post',), detail=False,
             serializer_class=ChangePasswordSerializer,
             permission_classes=(IsAuthenticated,),)
@@ -188,6 +412,7 @@ class UserViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
             methods=('post', 'delete'),
             serializer_class=SubscribeSerializer,
             permission_classes=(IsAuthenticated,),)
+    @idempotent
     def subscribe(self, request, pk=None):
         if request.method == 'POST':
             serializer = self.get_serializer(
@@ -211,10 +436,59 @@ class UserViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
             permission_classes=(IsAuthenticated,),
             pagination_class=Paginator)
     def subscriptions(self, request):
-        user = request.user
-        follow_list = user.following.all()
-        paginated_queryset = self.paginate_queryset(follow_list)
+        paginated_queryset = self.paginate_queryset(self.get_queryset())
         serializer = self.serializer_class(paginated_queryset,
                                            context={'request': request},
                                            many=True)
         return self.get_paginated_response(serializer.data)
+
+
+class ShoppingListExportViewSet(mixins.CreateModelMixin,
+                                mixins.RetrieveModelMixin,
+                                viewsets.GenericViewSet):
+    """Вьюсет фоновых выгрузок списка покупок"""
+    serializer_class = ShoppingListExportSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = None
+
+    def get_queryset(self):
+        return self.request.user.shopping_list_exports.all()
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job, created = submit_export(
+            request.user, serializer.validated_data.get(
+                'file_format', ShoppingListExport.PDF))
+        return Response(
+            self.get_serializer(job).data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK)
+
+    def retrieve(self, request, *args, **kwargs):
+        requeue_stale_exports(self.get_queryset())
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=True, methods=('get',))
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != ShoppingListExport.DONE:
+            return Response(self.get_serializer(job).data,
+                            status=status.HTTP_409_CONFLICT)
+        return FileResponse(job.file.open('rb'), as_attachment=True,
+                            filename=f'shopping-list.{job.file_format}')
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """Изменения избранного, корзины и подписок с версии since"""
+    permission_classes = (IsAuthenticated,)
+
+    throttle_cost = 1
+
+    def list(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            raise ValidationError({'since': 'Ожидается число'})
+        if since < 0:
+            raise ValidationError({'since': 'Ожидается число не меньше 0'})
+        return Response(changes_since(request.user, since))
@@ -0,0 +1,98 @@
+import logging
+import time
+
+from django.db import DatabaseError
+from django.urls import get_resolver, resolve
+
+from recipes.columnar import get_recipe_index
+from recipes.models import Recipe
+from api.cache import get_ingredients, get_tag_ids, get_tags
+from api.filters import NameIngredientsFilter, RecipeFilter
+from api.serializers import (IngredientSerializer, OutputUsersSerializer,
+                             RecipeCreateSerializer, RecipeGetSerializer,
+                             ShortRecipeSerializer, SubscriptionSerializer,
+                             TagSerializer)
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/1/',
+    '/api/recipes/1/favorite/',
+    '/api/recipes/1/shopping_cart/',
+    '/api/recipes/download_shopping_cart/',
+    '/api/tags/',
+    '/api/ingredients/',
+    '/api/users/',
+    '/api/users/me/',
+    '/api/users/subscriptions/',
+    '/api/auth/token/login/',
+)
+
+WARM_UP_SERIALIZERS = (
+    RecipeGetSerializer, RecipeCreateSerializer, ShortRecipeSerializer,
+    OutputUsersSerializer, SubscriptionSerializer, TagSerializer,
+    IngredientSerializer,
+)
+
+
+def _build_fields(serializer):
+    for field in serializer.fields.values():
+        child = getattr(field, 'child', field)
+        if hasattr(child, 'fields'):
+            _build_fields(child)
+
+
+def resolve_routes():
+    get_resolver().reverse_dict
+    for path in WARM_UP_PATHS:
+        resolve(path)
+
+
+def build_serializers():
+    for serializer_class in WARM_UP_SERIALIZERS:
+        _build_fields(serializer_class())
+
+
+def build_filters():
+    RecipeFilter(queryset=Recipe.objects.none()).form
+    NameIngredientsFilter().form
+
+
+def prime_caches():
+    get_tags()
+    get_tag_ids()
+    get_ingredients()
+
+
+def build_recipe_index():
+    get_recipe_index()
+
+
+WARM_UP_STEPS = (
+    ('routes', resolve_routes),
+    ('serializers', build_serializers),
+    ('filters', build_filters),
+    ('caches', prime_caches),
+    ('recipe_index', build_recipe_index),
+)
+
+
+def warm_up():
+    """Прогрев процесса: маршруты, сериализаторы, фильтры, кэши и индекс"""
+    timings = {}
+    started = time.perf_counter()
+    for name, step in WARM_UP_STEPS:
+        step_started = time.perf_counter()
+        try:
+            step()
+        except DatabaseError as error:
+            logger.warning('Warm-up step %s skipped: %s', name, error)
+        timings[name] = time.perf_counter() - step_started
+    timings['total'] = time.perf_counter() - started
+    logger.info('Warm-up finished in %.1f ms (%s)',
+                timings['total'] * 1000,
+                ', '.join(f'{name}={value * 1000:.1f}ms'
+                          for name, value in timings.items()
+                          if name != 'total'))
+    return timings
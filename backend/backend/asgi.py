@@ -3,6 +3,13 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The server-sent events endpoint ``/api/events/recipes/`` holds connections
+open and is served only through this entry point, e.g.
+``gunicorn -k uvicorn.workers.UvicornWorker backend.asgi``; it uses the
+``backend.events_urls`` URLconf so WSGI workers never get pinned by a stream.
+Run it with ``WARM_UP=False``: the gunicorn warm-up resolves API routes that
+this URLconf does not contain.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -12,5 +19,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+os.environ.setdefault('ROOT_URLCONF', 'backend.events_urls')
 
 application = get_asgi_application()
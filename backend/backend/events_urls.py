@@ -0,0 +1,7 @@
+from django.urls import path
+
+from api.streams import recipe_events
+
+urlpatterns = [
+    path('api/events/recipes/', recipe_events, name='recipe-events'),
+]
@@ -38,9 +38,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.TrafficCaptureMiddleware',
 ]
 
-ROOT_URLCONF = 'backend.urls'
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'backend.urls')
 
 TEMPLATES = [
     {
@@ -72,6 +73,67 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND',
+                             'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api': {'handlers': ['console'], 'level': 'INFO'},
+        'recipes': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', 2))
+
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS', 1000))
+FEED_BACKFILL_SIZE = 50
+FEED_BATCH_SIZE = 1000
+FEED_FANOUT_TIMEOUT = 60 * 5
+
+TRAFFIC_CAPTURE_RATE = float(os.getenv('TRAFFIC_CAPTURE_RATE', 0))
+TRAFFIC_CAPTURE_FILE = os.getenv('TRAFFIC_CAPTURE_FILE',
+                                 BASE_DIR / 'traffic.jsonl')
+TRAFFIC_CAPTURE_MAX_BODY = 64 * 1024
+
+RECIPE_INDEX_ENABLED = os.getenv(
+    'RECIPE_INDEX_ENABLED', 'False').lower() == 'true'
+
+EVENTS_BROKER = os.getenv('EVENTS_BROKER', 'api.events.InProcessBroker')
+EVENTS_HEARTBEAT = 15
+EVENTS_RETRY_MS = 5000
+EVENTS_QUEUE_SIZE = 100
+EVENTS_POLL_INTERVAL = 2
+EVENTS_POLL_OVERLAP = 30
+EVENTS_MAX_LIFETIME = 60 * 5
+EVENTS_TICKET_MAX_AGE = 60
+
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+IDEMPOTENCY_WAIT = 10
+
+DELETION_BATCH_SIZE = 500
+DELETION_JOB_TIMEOUT = 60 * 5
+
+SYNC_MAX_CHANGES = 1000
+SYNC_SETTLE_SECONDS = 5
+SYNC_LOG_RETENTION_DAYS = 30
+
+SHOPPING_LIST_EXPORT_TIMEOUT = 60 * 5
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -122,4 +184,19 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
 
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.CostThrottle',
+    ],
+
+    # Клиентский адрес берётся из X-Forwarded-For, который ставит gateway
+    'NUM_PROXIES': 1,
+
+}
+
+THROTTLE = {
+    'STORE': os.getenv('THROTTLE_STORE', 'api.throttling.LocMemBucketStore'),
+    'USER_CAPACITY': 120,
+    'USER_RATE': 2,
+    'IP_CAPACITY': 240,
+    'IP_RATE': 4,
 }
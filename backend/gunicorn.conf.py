@@ -0,0 +1,27 @@
+import os
+
+bind = '0.0.0.0:8000'
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+warm_up_enabled = os.getenv('WARM_UP', 'True').lower() == 'true'
+
+
+def when_ready(server):
+    """При preload прогреваем мастер, воркеры наследуют память"""
+    if not (preload_app and warm_up_enabled):
+        return
+    from django.db import connections
+
+    from api.warmup import warm_up
+    timings = warm_up()
+    server.log.info('Master warm-up took %.1f ms', timings['total'] * 1000)
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    if preload_app or not warm_up_enabled:
+        return
+    from api.warmup import warm_up
+    timings = warm_up()
+    worker.log.info('Worker %s warm-up took %.1f ms',
+                    worker.pid, timings['total'] * 1000)
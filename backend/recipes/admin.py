@@ -1,18 +1,46 @@
 from django.contrib import admin
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
+from recipes.deletion import schedule_deletion
 from recipes.models import (Ingredient, Tag, Recipe, Follow,
-                            Favorites, ShoppingList, Products)
+                            Favorites, ShoppingList, Products, DeletionJob)
+from recipes.paginators import EstimatedCountPaginator
+
+
+class BackgroundDeletionAdmin(admin.ModelAdmin):
+    """Удаление из админки через фоновые задания.
+
+    И удаление одного объекта, и действие delete_selected только
+    скрывают объекты и ставят их в очередь; страница подтверждения
+    не обходит связанные строки коллектором.
+    """
+
+    def delete_model(self, request, obj):
+        schedule_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            schedule_deletion(obj)
+
+    def get_deleted_objects(self, objs, request):
+        opts = self.model._meta
+        objs = list(objs)
+        perms_needed = (set() if self.has_delete_permission(request)
+                        else {opts.verbose_name})
+        return ([str(obj) for obj in objs],
+                {opts.verbose_name_plural: len(objs)}, perms_needed, [])
 
 
 class ProductsAdmin(admin.TabularInline):
     model = Products
     min_num = 1
+    raw_id_fields = ('ingredient',)
 
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name',)
     search_fields = ('name',)
-    list_filter = ('name',)
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -22,19 +50,57 @@ class TagAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
 
 
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(BackgroundDeletionAdmin):
     list_display = ('name', 'author', 'in_favorites')
-    search_fields = ('name',)
-    list_filter = ('name', 'author', 'tags',)
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username')
+    list_filter = ('tags',)
+    autocomplete_fields = ('author', 'tags')
     inlines = [ProductsAdmin]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
+    def get_queryset(self, request):
+        favorites = Favorites.objects.filter(
+            recipe=OuterRef('pk')).order_by().values('recipe').annotate(
+                count=Count('id')).values('count')
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(Subquery(favorites), 0))
+
+    @admin.display(description='В избранном', ordering='favorites_count')
     def in_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
+
+
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class UserRecipeAdmin(admin.ModelAdmin):
+    list_display = ('user', 'recipe', 'added')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = ('target', 'object_id', 'status', 'deleted', 'step',
+                    'created', 'updated', 'finished')
+    list_filter = ('status', 'target')
+    readonly_fields = [field.name for field in DeletionJob._meta.fields]
 
 
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
-admin.site.register(Follow)
-admin.site.register(Favorites)
-admin.site.register(ShoppingList)
+admin.site.register(Follow, FollowAdmin)
+admin.site.register(Favorites, UserRecipeAdmin)
+admin.site.register(ShoppingList, UserRecipeAdmin)
+admin.site.register(DeletionJob, DeletionJobAdmin)
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from recipes.models import (ChangeLogCompaction, ChangeLogEntry, Favorites,
+                            Follow, ShoppingList)
+
+LOGGED_RELATIONS = {
+    Favorites: (ChangeLogEntry.FAVORITES, 'recipe_id'),
+    ShoppingList: (ChangeLogEntry.SHOPPING_CART, 'recipe_id'),
+    Follow: (ChangeLogEntry.SUBSCRIPTIONS, 'author_id'),
+}
+
+
+def log_change(instance, action):
+    kind, field = LOGGED_RELATIONS[type(instance)]
+    ChangeLogEntry.objects.create(
+        user_id=instance.user_id, kind=kind,
+        object_id=getattr(instance, field), action=action)
+
+
+def get_watermark():
+    """Последняя версия, удалённая из журнала при сжатии"""
+    return ChangeLogCompaction.objects.values_list(
+        'version', flat=True).first() or 0
+
+
+def changes_since(user, since):
+    """Изменения пользователя после версии since.
+
+    Для каждого объекта остаётся последнее действие. Версия ответа
+    не доходит до записей моложе SYNC_SETTLE_SECONDS: рядом с ними
+    ещё могут закоммититься записи с меньшими id, поэтому свежие
+    записи придут повторно в следующем ответе.
+    """
+    watermark = get_watermark()
+    if since < watermark:
+        return {'resync': True, 'version': watermark}
+    limit = settings.SYNC_MAX_CHANGES
+    entries = list(ChangeLogEntry.objects.filter(
+        user=user, id__gt=since).order_by('id').values_list(
+            'id', 'kind', 'object_id', 'action', 'created')[:limit + 1])
+    settled = timezone.now() - timedelta(
+        seconds=settings.SYNC_SETTLE_SECONDS)
+    version = since
+    unsettled = False
+    latest = {}
+    for pk, kind, object_id, action, created in entries[:limit]:
+        latest[kind, object_id] = action
+        unsettled = unsettled or created >= settled
+        if not unsettled:
+            version = pk
+    result = {'resync': False, 'version': version,
+              'has_more': len(entries) > limit and version > since}
+    for kind, _ in ChangeLogEntry.KINDS:
+        result[kind] = {'added': [], 'removed': []}
+    for (kind, object_id), action in latest.items():
+        result[kind]['added' if action == ChangeLogEntry.ADD
+                     else 'removed'].append(object_id)
+    return result
+
+
+def compact(before, batch_size):
+    """Удаление записей старше before; возвращает число удалённых"""
+    old = ChangeLogEntry.objects.filter(created__lt=before)
+    version = old.aggregate(version=Max('id'))['version']
+    if version is None:
+        return 0
+    ChangeLogCompaction.objects.create(version=version)
+    deleted = 0
+    while True:
+        batch = list(ChangeLogEntry.objects.filter(
+            id__lte=version).values_list('id', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += ChangeLogEntry.objects.filter(id__in=batch).delete()[0]
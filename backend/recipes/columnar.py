@@ -0,0 +1,201 @@
+import logging
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from recipes.constants import RECIPE_INDEX_MAX_CHANGES
+from recipes.models import Recipe, RecipeIndexChange, Tag
+
+logger = logging.getLogger(__name__)
+
+FULL_REBUILD = 0
+MAX_TAGS = 64
+
+
+def current_version():
+    return RecipeIndexChange.objects.order_by('-id').values_list(
+        'id', flat=True).first() or 0
+
+
+def mark_changed(recipe_ids=(FULL_REBUILD,)):
+    """Новые версии индекса с записями об изменённых рецептах.
+
+    Журнал хранится в БД, чтобы изменения видели все процессы;
+    записи старше RECIPE_INDEX_MAX_CHANGES версий удаляются, так как
+    отставшие сильнее процессы всё равно строят индекс заново.
+    """
+    changes = RecipeIndexChange.objects.bulk_create(
+        RecipeIndexChange(recipe_id=recipe_id) for recipe_id in recipe_ids)
+    version = max(change.id or 0 for change in changes)
+    if version % RECIPE_INDEX_MAX_CHANGES < len(changes):
+        RecipeIndexChange.objects.filter(
+            id__lte=version - RECIPE_INDEX_MAX_CHANGES).delete()
+
+
+def timestamp(value):
+    if value is None:
+        return None
+    return int(value.timestamp() * 1_000_000)
+
+
+def in_range(column, start, stop):
+    mask = np.ones(len(column), dtype=bool)
+    if start is not None:
+        mask &= column >= start
+    if stop is not None:
+        mask &= column <= stop
+    return mask
+
+
+class Columns:
+    """Снимок колонок в порядке выдачи: новые рецепты первыми"""
+
+    def __init__(self, tag_bits, ids, authors, tags, cooking_times,
+                 published):
+        self.tag_bits = tag_bits
+        order = np.lexsort((-ids, -published))
+        self.ids = ids[order]
+        self.authors = authors[order]
+        self.tags = tags[order]
+        self.cooking_times = cooking_times[order]
+        self.published = published[order]
+
+    def without(self, recipe_ids):
+        keep = ~np.isin(self.ids, recipe_ids)
+        return (self.ids[keep], self.authors[keep], self.tags[keep],
+                self.cooking_times[keep], self.published[keep])
+
+
+class RecipeIndex:
+    """Индекс рецептов в массивах numpy для фильтров списка.
+
+    Сигналы пишут каждое изменение рецептов и тэгов в журнал
+    RecipeIndexChange; процесс, заметивший новую версию, перечитывает
+    из БД только изменённые рецепты, а при пропусках в журнале
+    изменений строит индекс заново. Изменения через update() ловит
+    RecipeQuerySet; bulk_create, raw SQL и правки в обход ORM индекс
+    не замечает - после них нужен mark_index_changed().
+    """
+
+    def __init__(self):
+        self.version = None
+        self.columns = None
+        self.tag_bits = {}
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        version = current_version()
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            changed = self.changes(version)
+            if changed is None:
+                self.rebuild()
+            elif changed:
+                self.update(changed)
+            self.version = version
+
+    def changes(self, version):
+        if (self.version is None or version < self.version
+                or version - self.version > RECIPE_INDEX_MAX_CHANGES):
+            return None
+        changes = list(RecipeIndexChange.objects.filter(
+            id__gt=self.version, id__lte=version).values_list(
+                'recipe_id', flat=True))
+        # Пропуск - запись ещё не закоммичена или уже удалена
+        if (len(changes) < version - self.version
+                or FULL_REBUILD in changes):
+            return None
+        return set(changes)
+
+    def rebuild(self):
+        tag_ids = list(Tag.objects.order_by('pk').values_list(
+            'pk', flat=True))
+        if len(tag_ids) > MAX_TAGS:
+            logger.warning('Recipe index disabled: more than %s tags',
+                           MAX_TAGS)
+            self.columns = None
+            return
+        self.tag_bits = {pk: 1 << bit for bit, pk in enumerate(tag_ids)}
+        self.columns = Columns(self.tag_bits,
+                               *self.load(Recipe.objects.all()))
+
+    def update(self, recipe_ids):
+        if self.columns is None:
+            return self.rebuild()
+        recipe_ids = np.fromiter(recipe_ids, dtype=np.int64)
+        loaded = self.load(Recipe.objects.filter(pk__in=recipe_ids.tolist()))
+        self.columns = Columns(self.tag_bits, *(
+            np.concatenate(pair) for pair in
+            zip(self.columns.without(recipe_ids), loaded)))
+
+    def load(self, queryset):
+        rows = list(queryset.order_by().values_list(
+            'pk', 'author_id', 'cooking_time', 'pub_date'))
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64,
+                          count=len(rows))
+        authors = np.fromiter((row[1] for row in rows), dtype=np.int64,
+                              count=len(rows))
+        cooking_times = np.fromiter((row[2] for row in rows),
+                                    dtype=np.int32, count=len(rows))
+        published = np.fromiter((timestamp(row[3]) for row in rows),
+                                dtype=np.int64, count=len(rows))
+        tags = np.zeros(len(rows), dtype=np.uint64)
+        links = np.array(Recipe.tags.through.objects.filter(
+            recipe__in=queryset.order_by()).values_list(
+                'recipe_id', 'tag_id'), dtype=np.int64).reshape(-1, 2)
+        if len(links) and len(ids):
+            sorter = np.argsort(ids)
+            positions = sorter[np.minimum(
+                np.searchsorted(ids, links[:, 0], sorter=sorter),
+                len(ids) - 1)]
+            # Связи рецептов, созданных после чтения колонок, пропускаются
+            known = ids[positions] == links[:, 0]
+            bits = np.fromiter((self.tag_bits.get(tag_id, 0)
+                                for tag_id in links[known, 1].tolist()),
+                               dtype=np.uint64, count=int(known.sum()))
+            np.bitwise_or.at(tags, positions[known], bits)
+        return ids, authors, tags, cooking_times, published
+
+    def filter(self, tag_ids=(), author_id=None, recipe_ids=None,
+               cooking_time=None, published=None):
+        """Id рецептов, прошедших фильтры, в порядке выдачи.
+
+        Диапазоны cooking_time и published задаются срезами с
+        включительными границами, как в RangeFilter.
+        """
+        columns = self.columns
+        mask = np.ones(len(columns.ids), dtype=bool)
+        if tag_ids:
+            wanted = np.uint64(sum(columns.tag_bits.get(pk, 0)
+                                   for pk in set(tag_ids)))
+            mask &= (columns.tags & wanted) != 0
+        if author_id is not None:
+            mask &= columns.authors == author_id
+        if recipe_ids is not None:
+            mask &= np.isin(columns.ids,
+                            np.fromiter(recipe_ids, dtype=np.int64))
+        if cooking_time is not None:
+            mask &= in_range(columns.cooking_times, cooking_time.start,
+                             cooking_time.stop)
+        if published is not None:
+            mask &= in_range(columns.published,
+                             timestamp(published.start),
+                             timestamp(published.stop))
+        return columns.ids[mask]
+
+
+_index = RecipeIndex()
+
+
+def get_recipe_index():
+    """Актуальный индекс процесса или None, если он выключен"""
+    if not settings.RECIPE_INDEX_ENABLED:
+        return None
+    _index.refresh()
+    if _index.columns is None:
+        return None
+    return _index
@@ -1,2 +1,14 @@
 MIN_VAL = 1
 MAX_VAL = 32000
+FAVORITE_WEIGHT = 1.0
+SHOPPING_LIST_WEIGHT = 0.5
+POPULARITY_HALF_LIFE_DAYS = 7
+POPULARITY_WINDOW_DAYS = 90
+ESTIMATED_COUNT_THRESHOLD = 100000
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+MINHASH_SEED = 1148
+SIMILAR_MAX_CANDIDATES = 500
+SIMILARITY_WATERMARK_OVERLAP = 60 * 10
+RECIPE_INDEX_MAX_CHANGES = 500
+LEGACY_RECIPE_IMAGE_DIRECTORY = 'recipes/'
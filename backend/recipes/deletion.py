@@ -0,0 +1,115 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.utils import timezone
+
+from recipes.exports import delete_export_files
+from recipes.models import DeletionJob, Recipe, User
+from recipes.tasks import run_in_background
+
+logger = logging.getLogger(__name__)
+
+TARGET_MODELS = {
+    DeletionJob.RECIPE: Recipe,
+    DeletionJob.USER: User,
+}
+
+
+def purge(model, lookup, value, batch_size, parents=()):
+    """Пакетное удаление строк model по lookup=value и зависимых строк.
+
+    Сначала рекурсивно удаляются строки, ссылающиеся на model через
+    CASCADE, затем сами строки, пачками по batch_size id в отдельных
+    коротких транзакциях. Отдаёт пары (таблица, удалено строк).
+    """
+    relations = list(get_candidate_relations_to_delete(model._meta))
+    for relation in relations:
+        related_model = relation.related_model
+        if (relation.on_delete is not models.CASCADE
+                or related_model in parents + (model,)):
+            continue
+        yield from purge(related_model,
+                         f'{relation.field.name}__{lookup}', value,
+                         batch_size, parents + (model,))
+    # Зависимых строк уже нет, поэтому коллектор и сигналы не нужны
+    raw = all(relation.on_delete is models.CASCADE
+              for relation in relations)
+    queryset = model._base_manager.filter(**{lookup: value}).order_by()
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        batch = model._base_manager.filter(pk__in=ids)
+        with transaction.atomic():
+            if raw:
+                deleted = batch._raw_delete(batch.db)
+            else:
+                deleted = batch.delete()[0]
+        yield model._meta.label, deleted
+
+
+def schedule_deletion(obj):
+    """Скрытие пользователя или рецепта и фоновое удаление"""
+    target = (DeletionJob.USER if isinstance(obj, User)
+              else DeletionJob.RECIPE)
+    with transaction.atomic():
+        if target == DeletionJob.USER:
+            User.objects.filter(pk=obj.pk).update(is_hidden=True,
+                                                  is_active=False)
+            Recipe.all_objects.filter(author_id=obj.pk).update(
+                is_hidden=True)
+        else:
+            Recipe.all_objects.filter(pk=obj.pk).update(is_hidden=True)
+        job, created = DeletionJob.objects.get_or_create(
+            target=target, object_id=obj.pk)
+        if created:
+            run_in_background(run_deletion, job.pk)
+    return job
+
+
+def run_deletion(job_id):
+    """Выполнение задания; прерванное задание продолжается с начала"""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.DELETION_JOB_TIMEOUT)
+    claimed = DeletionJob.objects.filter(
+        Q(status__in=(DeletionJob.PENDING, DeletionJob.FAILED))
+        | Q(status=DeletionJob.RUNNING, updated__lt=stale),
+        pk=job_id).update(status=DeletionJob.RUNNING, error='', updated=now)
+    if not claimed:
+        return
+    job = DeletionJob.objects.get(pk=job_id)
+    try:
+        if job.target == DeletionJob.USER:
+            delete_export_files(job.object_id)
+        for label, deleted in purge(TARGET_MODELS[job.target], 'pk',
+                                    job.object_id,
+                                    settings.DELETION_BATCH_SIZE):
+            job.deleted += deleted
+            job.step = label
+            job.save(update_fields=('deleted', 'step', 'updated'))
+    except Exception as error:
+        job.status = DeletionJob.FAILED
+        job.error = str(error)
+        job.save(update_fields=('status', 'error', 'updated'))
+        raise
+    job.status = DeletionJob.DONE
+    job.step = ''
+    job.finished = timezone.now()
+    job.save(update_fields=('status', 'step', 'finished', 'updated'))
+    logger.info('Deleted %s %s: %s rows', job.target, job.object_id,
+                job.deleted)
+
+
+def unfinished_deletions():
+    """Задания, брошенные при перезапуске или завершившиеся ошибкой"""
+    stale = timezone.now() - timedelta(
+        seconds=settings.DELETION_JOB_TIMEOUT)
+    return list(DeletionJob.objects.filter(
+        Q(status__in=(DeletionJob.PENDING, DeletionJob.FAILED),
+          created__lt=stale)
+        | Q(status=DeletionJob.RUNNING, updated__lt=stale)
+    ).values_list('pk', flat=True))
@@ -0,0 +1,173 @@
+import hashlib
+import io
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from recipes.models import Products, ShoppingListExport
+from recipes.tasks import run_in_background
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+except ImportError:
+    A4 = None
+
+PDF_FONT_NAME = 'ShoppingListFont'
+
+
+def pdf_available():
+    return A4 is not None
+
+
+def cart_products(user):
+    return Products.objects.filter(recipe__shopping_list__user=user,
+                                   recipe__is_hidden=False)
+
+
+def shopping_list_fingerprint(user):
+    """Отпечаток содержимого корзины: меняется вместе со списком покупок"""
+    digest = hashlib.sha256()
+    for row in cart_products(user).order_by(
+            'recipe_id', 'ingredient_id').values_list(
+                'recipe_id', 'ingredient_id', 'amount'):
+        digest.update(repr(row).encode())
+    return digest.hexdigest()
+
+
+def collect_shopping_list(user):
+    """Итоги по ингредиентам и состав каждого рецепта"""
+    products = cart_products(user)
+    totals = products.values(
+        'ingredient__name', 'ingredient__measurement_unit').annotate(
+            total=Sum('amount')).order_by('ingredient__name')
+    recipes = {}
+    for product in products.select_related(
+            'recipe', 'ingredient').order_by('recipe__name', 'id'):
+        recipes.setdefault(product.recipe.name, []).append(
+            (product.ingredient.name, product.amount,
+             product.ingredient.measurement_unit))
+    return ([(row['ingredient__name'], row['total'],
+              row['ingredient__measurement_unit']) for row in totals],
+            recipes)
+
+
+def render_txt(totals, recipes):
+    lines = ['Список покупок', '']
+    lines += [f'{name} — {amount} {unit}' for name, amount, unit in totals]
+    for recipe, ingredients in recipes.items():
+        lines += ['', recipe]
+        lines += [f'  {name} — {amount} {unit}'
+                  for name, amount, unit in ingredients]
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def render_pdf(totals, recipes):
+    font = settings.SHOPPING_LIST_PDF_FONT
+    styles = getSampleStyleSheet()
+    if font and os.path.exists(font):
+        if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font))
+        for style in styles.byName.values():
+            style.fontName = PDF_FONT_NAME
+    table_style = [('FONTNAME', (0, 0), (-1, -1),
+                    styles['Normal'].fontName)]
+    story = [Paragraph('Список покупок', styles['Title'])]
+    if totals:
+        story.append(Table([list(row) for row in totals], style=table_style))
+    for recipe, ingredients in recipes.items():
+        story += [Spacer(0, 12), Paragraph(recipe, styles['Heading2']),
+                  Table([list(row) for row in ingredients],
+                        style=table_style)]
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=A4).build(story)
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    ShoppingListExport.PDF: render_pdf,
+    ShoppingListExport.TXT: render_txt,
+}
+
+
+def process_export(job_id):
+    """Формирование файла выгрузки в фоновом воркере"""
+    claimed = ShoppingListExport.objects.filter(
+        pk=job_id, status=ShoppingListExport.PENDING).update(
+            status=ShoppingListExport.RUNNING, started=timezone.now())
+    if not claimed:
+        return
+    job = ShoppingListExport.objects.select_related('user').get(pk=job_id)
+    try:
+        content = RENDERERS[job.file_format](
+            *collect_shopping_list(job.user))
+        job.file.save(f'shopping-list-{job.pk}.{job.file_format}',
+                      ContentFile(content), save=False)
+        job.status = ShoppingListExport.DONE
+    except Exception as error:
+        job.status = ShoppingListExport.FAILED
+        job.error = str(error)
+        raise
+    finally:
+        job.finished = timezone.now()
+        job.save(update_fields=('file', 'status', 'error', 'finished'))
+    outdated = ShoppingListExport.objects.filter(
+        user=job.user, file_format=job.file_format,
+        status=ShoppingListExport.DONE).exclude(pk=job.pk)
+    for old_job in outdated:
+        old_job.file.delete(save=False)
+        old_job.delete()
+
+
+def submit_export(user, file_format):
+    """Задание на выгрузку; одинаковые запросы получают одно задание"""
+    job, created = ShoppingListExport.objects.exclude(
+        status=ShoppingListExport.FAILED).get_or_create(
+            user=user, fingerprint=shopping_list_fingerprint(user),
+            file_format=file_format)
+    if created:
+        run_in_background(process_export, job.pk)
+    return job, created
+
+
+def stale_exports(queryset=None):
+    """Задания, потерянные при перезапуске воркеров, снова в очереди.
+
+    Задание отдаётся не чаще раза в SHOPPING_LIST_EXPORT_TIMEOUT:
+    отметка queued переставляется атомарно, поэтому частые опросы
+    статуса не ставят его в очередь повторно.
+    """
+    if queryset is None:
+        queryset = ShoppingListExport.objects.all()
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.SHOPPING_LIST_EXPORT_TIMEOUT)
+    queryset.filter(status=ShoppingListExport.RUNNING,
+                    started__lt=stale).update(
+                        status=ShoppingListExport.PENDING,
+                        queued=F('started'))
+    job_ids = queryset.filter(
+        status=ShoppingListExport.PENDING, queued__lt=stale
+    ).values_list('pk', flat=True)
+    return [job_id for job_id in job_ids
+            if ShoppingListExport.objects.filter(
+                pk=job_id, status=ShoppingListExport.PENDING,
+                queued__lt=stale).update(queued=now)]
+
+
+def requeue_stale_exports(queryset=None):
+    for job_id in stale_exports(queryset):
+        run_in_background(process_export, job_id)
+
+
+def delete_export_files(user_id):
+    """Файлы выгрузок пользователя: строки удаляются без сигналов"""
+    for job in ShoppingListExport.objects.filter(
+            user_id=user_id).exclude(file=''):
+        job.file.delete(save=False)
@@ -0,0 +1,122 @@
+import heapq
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from recipes.models import FeedEntry, Follow, Recipe
+
+
+def is_celebrity(author_id):
+    """Порог подписчиков проверяется при публикации, а не при чтении"""
+    threshold = settings.FEED_FANOUT_MAX_FOLLOWERS
+    return Follow.objects.filter(
+        author_id=author_id)[:threshold].count() >= threshold
+
+
+def fan_out_recipe(recipe_id):
+    """Рассылка нового рецепта в ленты подписчиков.
+
+    Пока рассылка не закончена, рецепт остаётся в статусе PENDING и
+    читается лентой напрямую, поэтому прерванная рассылка ничего не
+    теряет и может быть повторена.
+    """
+    recipe = Recipe.all_objects.filter(
+        pk=recipe_id, feed_delivery=Recipe.PENDING).values(
+            'author_id', 'pub_date').first()
+    if recipe is None:
+        return
+    if is_celebrity(recipe['author_id']):
+        Recipe.all_objects.filter(pk=recipe_id).update(
+            feed_delivery=Recipe.PULLED)
+        return
+    followers = Follow.objects.filter(
+        author_id=recipe['author_id']).values_list('user_id', flat=True)
+    batch = []
+    for user_id in followers.iterator(chunk_size=settings.FEED_BATCH_SIZE):
+        batch.append(FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                               **recipe))
+        if len(batch) >= settings.FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+    Recipe.all_objects.filter(pk=recipe_id).update(
+        feed_delivery=Recipe.PUSHED)
+
+
+def pending_fan_outs():
+    """Рецепты, рассылка которых прервана перезапуском"""
+    stale = timezone.now() - timedelta(seconds=settings.FEED_FANOUT_TIMEOUT)
+    return list(Recipe.objects.filter(
+        feed_delivery=Recipe.PENDING, pub_date__lt=stale
+    ).order_by('pub_date').values_list('pk', flat=True))
+
+
+def backfill_feed(user_id, author_id):
+    """Добавление последних рецептов автора в ленту нового подписчика"""
+    # Задачи подписки и отписки выполняются в пуле в любом порядке:
+    # после быстрой отписки записи в ленту уже не нужны
+    if not Follow.objects.filter(user_id=user_id,
+                                 author_id=author_id).exists():
+        return
+    # PENDING тоже копируется: рассылка могла прочитать подписчиков
+    # до появления этой подписки
+    recipes = Recipe.objects.filter(
+        author_id=author_id,
+        feed_delivery__in=(Recipe.PUSHED, Recipe.PENDING)
+    ).order_by('-pub_date').values_list(
+        'id', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                   author_id=author_id, pub_date=pub_date)
+         for recipe_id, pub_date in recipes],
+        ignore_conflicts=True)
+
+
+def clean_feed(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def older_than(queryset, position, id_field):
+    """Строки после позиции (pub_date, id) в порядке убывания"""
+    if position is None:
+        return queryset
+    pub_date, recipe_id = position
+    return queryset.filter(
+        Q(pub_date__lt=pub_date)
+        | Q(pub_date=pub_date, **{f'{id_field}__lt': recipe_id}))
+
+
+class Timeline:
+    """Лента пользователя: разосланные записи и неразосланные рецепты.
+
+    Страница читается от позиции последнего показанного рецепта, поэтому
+    из каждого источника берётся не больше size строк на любой глубине.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @property
+    def entries(self):
+        return FeedEntry.objects.filter(
+            user=self.user, recipe__feed_delivery=Recipe.PUSHED)
+
+    @property
+    def pulled_recipes(self):
+        return Recipe.objects.filter(
+            author_id__in=Follow.objects.filter(
+                user=self.user).values('author_id'),
+            feed_delivery__in=(Recipe.PENDING, Recipe.PULLED))
+
+    def get_positions(self, position, size):
+        """Позиции (pub_date, id) следующих size рецептов ленты"""
+        entries = older_than(self.entries, position, 'recipe_id').order_by(
+            '-pub_date', '-recipe_id').values_list(
+                'pub_date', 'recipe_id')[:size]
+        recipes = older_than(self.pulled_recipes, position, 'id').order_by(
+            '-pub_date', '-id').values_list('pub_date', 'id')[:size]
+        return list(islice(heapq.merge(entries, recipes, reverse=True),
+                           size))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import Recipe, SimilarityIndexRun
+from recipes.similarity import dirty_recipes, index_recipes
+
+
+class Command(BaseCommand):
+
+    help = 'Update MinHash signatures and LSH buckets of similar recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--full', action='store_true',
+                            help='Recalculate all signatures')
+
+    def handle(self, *args, **options):
+        queryset = (Recipe.objects.all() if options['full']
+                    else dirty_recipes())
+        run = SimilarityIndexRun.objects.create()
+        last_id = 0
+        checked = updated = 0
+        while True:
+            recipe_ids = list(queryset.filter(pk__gt=last_id).order_by(
+                'pk').values_list('pk', flat=True)[:options['batch_size']])
+            if not recipe_ids:
+                break
+            checked += len(recipe_ids)
+            updated += index_recipes(recipe_ids, full=options['full'])
+            last_id = recipe_ids[-1]
+        run.finished = timezone.now()
+        run.updated = updated
+        run.save(update_fields=('finished', 'updated'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} recipes, updated {updated} signatures'))
@@ -0,0 +1,130 @@
+import json
+import re
+from itertools import product
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.pagination import Paginator
+from api.views import RecipeViewSet
+from recipes.models import Recipe, Tag
+from users.models import User
+
+TABLE = Recipe._meta.db_table
+SQLITE_FULL_SCAN = re.compile(rf'SCAN {TABLE}\b')
+SQLITE_INDEXED_SCAN = re.compile(rf'SCAN {TABLE} USING (COVERING )?INDEX')
+SQLITE_SORT = re.compile(r'USE TEMP B-TREE FOR ORDER BY')
+
+
+def postgresql_problems(node, sorted_above=False):
+    """Полные проходы по таблице рецептов в плане PostgreSQL"""
+    if node.get('Relation Name') == TABLE:
+        if node['Node Type'] == 'Seq Scan':
+            yield 'seq scan'
+        elif (node['Node Type'] in ('Index Scan', 'Index Only Scan')
+              and 'Index Cond' not in node and sorted_above):
+            yield f'full scan of {node["Index Name"]} + sort'
+    sorted_above = sorted_above or node['Node Type'] == 'Sort'
+    for child in node.get('Plans', ()):
+        yield from postgresql_problems(child, sorted_above)
+
+
+def sqlite_problems(plan):
+    if SQLITE_FULL_SCAN.search(plan):
+        if not SQLITE_INDEXED_SCAN.search(plan):
+            yield 'full scan'
+        elif SQLITE_SORT.search(plan):
+            yield 'full index scan + sort'
+
+
+ORDERINGS = ('', 'cooking_time', '-cooking_time', 'name', '-name',
+             'pub_date', '-pub_date', 'popularity', '-popularity')
+
+
+class Command(BaseCommand):
+
+    help = ('EXPLAIN the recipe list query for every supported filter and '
+            'ordering and fail on full scans of the recipes table followed '
+            'by a sort')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user',
+                            help='Email of the user for is_favorited and '
+                                 'is_in_shopping_cart checks')
+        parser.add_argument('--natural', action='store_true',
+                            help='Keep sequential scans enabled and check '
+                                 'the plans chosen for the current data')
+        parser.add_argument('--verbose-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'Unsupported database: {vendor}')
+        user = None
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError('User does not exist')
+        failures = 0
+        checks = list(product(self.filter_sets(user), ORDERINGS))
+        with transaction.atomic():
+            if vendor == 'postgresql' and not options['natural']:
+                # Так проверяется наличие подходящего индекса даже
+                # на небольшой базе, где seq scan дешевле
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for params, ordering in checks:
+                query = dict(params, ordering=ordering) if ordering else params
+                plan, problems = self.explain(query, user, vendor)
+                failures += bool(problems)
+                label = '&'.join(f'{key}={value}'
+                                 for key, value in query.items()) or '-'
+                status = (self.style.ERROR(', '.join(problems)) if problems
+                          else 'ok')
+                self.stdout.write(f'{label:60} {status}')
+                if options['verbose_plans'] or problems:
+                    self.stdout.write(plan)
+        if failures:
+            raise CommandError(
+                f'{failures} of {len(checks)} queries scan all of {TABLE}')
+        self.stdout.write(self.style.SUCCESS(
+            f'All {len(checks)} queries are served by indexes'))
+
+    @staticmethod
+    def filter_sets(user):
+        now = timezone.now()
+        filter_sets = [
+            {},
+            {'cooking_time_min': 10, 'cooking_time_max': 60},
+            {'pub_date_after': (now - timezone.timedelta(days=30)
+                                ).isoformat()},
+        ]
+        tag = Tag.objects.values_list('slug', flat=True).first()
+        if tag:
+            filter_sets.append({'tags': tag})
+        author = (Recipe.objects.values_list('author_id', flat=True).first()
+                  or (user.pk if user else None))
+        if author:
+            filter_sets.append({'author': author})
+        if user is not None:
+            filter_sets += [{'is_favorited': 1}, {'is_in_shopping_cart': 1}]
+        return filter_sets
+
+    @staticmethod
+    def explain(query, user, vendor):
+        request = Request(APIRequestFactory().get('/api/recipes/', query))
+        if user is not None:
+            request.user = user
+        view = RecipeViewSet(request=request, action='list',
+                             format_kwarg=None, kwargs={})
+        queryset = view.filter_queryset(
+            view.get_queryset())[:Paginator.page_size]
+        if vendor == 'postgresql':
+            plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+            return (json.dumps(plan, indent=2),
+                    list(postgresql_problems(plan)))
+        plan = queryset.explain()
+        return plan, list(sqlite_problems(plan))
@@ -0,0 +1,115 @@
+import os
+import time
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from recipes.constants import LEGACY_RECIPE_IMAGE_DIRECTORY
+from recipes.models import Recipe
+
+
+def file_fields():
+    """Все файловые поля проекта: файл живой, если на него есть ссылка"""
+    return [(model, field.name) for model in apps.get_models()
+            for field in model._meta.get_fields()
+            if isinstance(field, models.FileField)]
+
+
+class Command(BaseCommand):
+
+    help = 'Report and remove media files not referenced by any file field'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory', action='append',
+            help='Directory inside MEDIA_ROOT to scan, may be repeated; '
+                 'defaults to the current and legacy recipe image '
+                 'directories')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--delete', action='store_true',
+                            help='Delete orphaned files')
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Keep orphans younger than this')
+
+    def handle(self, *args, **options):
+        directories = options['directory'] or (
+            Recipe._meta.get_field('image').upload_to,
+            LEGACY_RECIPE_IMAGE_DIRECTORY)
+        fields = file_fields()
+        deadline = time.time() - options['grace_hours'] * 3600
+        stats = dict.fromkeys(('files', 'bytes', 'orphans', 'orphan_bytes',
+                               'deleted', 'deleted_bytes'), 0)
+        for directory in directories:
+            root = default_storage.path(directory)
+            if not os.path.isdir(root):
+                self.stderr.write(f'Directory {root} does not exist')
+                continue
+            for batch in self.scan(root, options['batch_size']):
+                expired = self.check(batch, fields, deadline, stats)
+                if options['delete']:
+                    for name, size in expired:
+                        default_storage.delete(name)
+                        stats['deleted'] += 1
+                        stats['deleted_bytes'] += size
+        self.stdout.write(
+            f'Files: {stats["files"]} ({self.size(stats["bytes"])}), '
+            f'orphans: {stats["orphans"]} '
+            f'({self.size(stats["orphan_bytes"])})')
+        if options['delete']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Deleted {stats["deleted"]} files '
+                f'({self.size(stats["deleted_bytes"])})'))
+
+    @staticmethod
+    def check(batch, fields, deadline, stats):
+        """Учёт пачки файлов; отдаёт устаревшие файлы без ссылок"""
+        names = [name for name, _, _ in batch]
+        referenced = set()
+        for model, field in fields:
+            # Файлы скрытых, но ещё не удалённых объектов тоже живые
+            referenced.update(model._base_manager.filter(
+                **{f'{field}__in': names}).values_list(field, flat=True))
+        expired = []
+        for name, size, modified in batch:
+            stats['files'] += 1
+            stats['bytes'] += size
+            if name in referenced:
+                continue
+            stats['orphans'] += 1
+            stats['orphan_bytes'] += size
+            if modified < deadline:
+                expired.append((name, size))
+        return expired
+
+    def scan(self, root, batch_size):
+        """Обход каталога пачками (имя в хранилище, размер, mtime)"""
+        location = default_storage.path('')
+        directories = [root]
+        batch = []
+        while directories:
+            with os.scandir(directories.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    stat = entry.stat()
+                    name = os.path.relpath(entry.path, location)
+                    batch.append((name.replace(os.sep, '/'),
+                                  stat.st_size, stat.st_mtime))
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def size(value):
+        for unit in ('B', 'KB', 'MB'):
+            if value < 1024:
+                return f'{value:.0f} {unit}'
+            value /= 1024
+        return f'{value:.1f} GB'
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.changelog import compact
+
+
+class Command(BaseCommand):
+
+    help = ('Delete old change log entries; clients that synced before '
+            'them are told to do a full resync')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=settings.SYNC_LOG_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = compact(timezone.now() - timedelta(days=options['days']),
+                          options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} change log entries'))
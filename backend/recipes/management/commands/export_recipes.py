@@ -0,0 +1,51 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+
+def recipe_to_dict(recipe):
+    return {
+        'id': recipe.pk,
+        'author': recipe.author.email,
+        'name': recipe.name,
+        'text': recipe.text,
+        'image': recipe.image.name,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {'name': product.ingredient.name,
+             'measurement_unit': product.ingredient.measurement_unit,
+             'amount': product.amount}
+            for product in recipe.recipe_ingredients.all()
+        ],
+    }
+
+
+class Command(BaseCommand):
+
+    help = 'Export recipes to a JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-',
+                            help='Output file, stdout by default')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            'tags', 'recipe_ingredients__ingredient').order_by('pk')
+        output = (sys.stdout if options['output'] == '-'
+                  else open(options['output'], 'w', encoding='utf-8'))
+        exported = 0
+        try:
+            for recipe in recipes.iterator(chunk_size=options['chunk_size']):
+                output.write(json.dumps(recipe_to_dict(recipe),
+                                        ensure_ascii=False) + '\n')
+                exported += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(f'Exported {exported} recipes'))
@@ -0,0 +1,120 @@
+import json
+import os
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes.models import (ImportCheckpoint, ImportedRecipe, Ingredient,
+                            Products, Recipe, Tag)
+from recipes.signals import mark_index_changed
+from users.models import User
+
+
+class Command(BaseCommand):
+
+    help = 'Import recipes from a JSONL file created by export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--source',
+            help='Name of the import for progress tracking, '
+                 'the input file name by default')
+        parser.add_argument('--id-map',
+                            help='Write the old to new id map to this file')
+        parser.add_argument('--default-author',
+                            help='Email of the author for unknown authors')
+
+    def handle(self, *args, **options):
+        self.source = options['source'] or os.path.basename(options['input'])
+        self.authors = dict(User.objects.values_list('email', 'id'))
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')}
+        self.default_author = None
+        if options['default_author']:
+            if options['default_author'] not in self.authors:
+                raise CommandError('Default author does not exist')
+            self.default_author = self.authors[options['default_author']]
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            source=self.source)
+        done = checkpoint.lines
+        imported = skipped = 0
+        with open(options['input'], encoding='utf-8') as source:
+            lines = islice(source, done, None)
+            while True:
+                batch = list(islice(lines, options['batch_size']))
+                if not batch:
+                    break
+                rows = [json.loads(line) for line in batch if line.strip()]
+                done += len(batch)
+                # Рецепты, соответствие id и прогресс пишутся в одной
+                # транзакции: после сбоя пачка повторяется целиком
+                with transaction.atomic():
+                    created = self.import_batch(rows)
+                    ImportCheckpoint.objects.filter(
+                        source=self.source).update(lines=done)
+                imported += len(created)
+                skipped += len(rows) - len(created)
+                self.stdout.write(f'Processed {done} lines')
+        if imported:
+            mark_index_changed()
+        if options['id_map']:
+            self.write_id_map(options['id_map'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} recipes, skipped {skipped}'))
+
+    def import_batch(self, rows):
+        recipes = []
+        sources = []
+        for row in rows:
+            author_id = self.authors.get(row['author'], self.default_author)
+            if author_id is None:
+                self.stderr.write(f'Unknown author {row["author"]}, '
+                                  f'recipe {row["id"]} skipped')
+                continue
+            recipes.append(Recipe(
+                author_id=author_id, name=row['name'], text=row['text'],
+                image=row['image'], cooking_time=row['cooking_time']))
+            sources.append(row)
+        Recipe.objects.bulk_create(recipes)
+        for recipe, row in zip(recipes, sources):
+            recipe.pub_date = parse_datetime(row['pub_date'])
+        Recipe.objects.bulk_update(recipes, ('pub_date',))
+        Products.objects.bulk_create(
+            Products(recipe=recipe,
+                     ingredient_id=self.get_ingredient(item),
+                     amount=item['amount'])
+            for recipe, row in zip(recipes, sources)
+            for item in row['ingredients'])
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.pk,
+                                tag_id=self.tags[slug])
+            for recipe, row in zip(recipes, sources)
+            for slug in row['tags'] if slug in self.tags)
+        ImportedRecipe.objects.bulk_create(
+            ImportedRecipe(source=self.source, source_id=row['id'],
+                           recipe=recipe)
+            for recipe, row in zip(recipes, sources))
+        return [(row['id'], recipe.pk)
+                for recipe, row in zip(recipes, sources)]
+
+    def get_ingredient(self, item):
+        key = (item['name'], item['measurement_unit'])
+        if key not in self.ingredients:
+            self.ingredients[key] = Ingredient.objects.get_or_create(
+                name=key[0], measurement_unit=key[1])[0].pk
+        return self.ingredients[key]
+
+    def write_id_map(self, path):
+        """Полное соответствие id из БД, а не только этого запуска"""
+        with open(path, 'w', encoding='utf-8') as file:
+            for old_id, new_id in ImportedRecipe.objects.filter(
+                    source=self.source).values_list(
+                        'source_id', 'recipe_id').iterator():
+                file.write(f'{old_id}\t{new_id}\n')
+        self.stdout.write(f'Id map written to {path}')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipes.deletion import run_deletion, unfinished_deletions
+from recipes.models import DeletionJob
+
+
+class Command(BaseCommand):
+
+    help = 'Resume background deletions left unfinished by a restart'
+
+    def handle(self, *args, **options):
+        job_ids = unfinished_deletions()
+        failed = 0
+        for job_id in job_ids:
+            # Задание уже помечено FAILED и будет повторено следующим запуском
+            try:
+                run_deletion(job_id)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(self.style.ERROR(
+                    f'Deletion {job_id} failed: {error}'))
+                continue
+            job = DeletionJob.objects.get(pk=job_id)
+            self.stdout.write(f'{job.target} {job.object_id}: {job.status}, '
+                              f'{job.deleted} rows deleted')
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(job_ids)} deletions, {failed} failed'))
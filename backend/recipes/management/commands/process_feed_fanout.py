@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import fan_out_recipe, pending_fan_outs
+
+
+class Command(BaseCommand):
+
+    help = 'Fan out recipes whose feed delivery was cut short by a restart'
+
+    def handle(self, *args, **options):
+        recipe_ids = pending_fan_outs()
+        for recipe_id in recipe_ids:
+            fan_out_recipe(recipe_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(recipe_ids)} recipes'))
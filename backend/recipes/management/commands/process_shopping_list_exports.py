@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes.exports import process_export, stale_exports
+
+
+class Command(BaseCommand):
+
+    help = 'Render shopping list exports left unfinished by a restart'
+
+    def handle(self, *args, **options):
+        job_ids = stale_exports()
+        failed = 0
+        for job_id in job_ids:
+            # Выгрузка уже помечена FAILED, пользователь увидит ошибку
+            try:
+                process_export(job_id)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(self.style.ERROR(
+                    f'Export {job_id} failed: {error}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(job_ids)} exports, {failed} failed'))
@@ -0,0 +1,206 @@
+import random
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from api.profiling import FieldProfiler, StackSampler
+from api.views import RecipeViewSet, UserViewSet
+from recipes.models import (Favorites, Follow, Ingredient, Products, Recipe,
+                            ShoppingList, Tag)
+from users.models import User
+
+SERIALIZER_TARGETS = {
+    'recipe': (RecipeViewSet, 'list', '/api/recipes/'),
+    'subscription': (UserViewSet, 'subscriptions',
+                     '/api/users/subscriptions/'),
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+def server_name():
+    """Хост из ALLOWED_HOSTS: testserver клиента там обычно не разрешён"""
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip('.')
+        if host and host != '*':
+            return host
+    return 'localhost'
+
+
+class Command(BaseCommand):
+
+    help = ('Profile an endpoint or a serializer: cost per serializer field '
+            'and collapsed stacks for flame graphs')
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--path', help='Endpoint with query string')
+        target.add_argument('--serializer', choices=SERIALIZER_TARGETS,
+                            help='Serialize a page of the view queryset')
+        parser.add_argument('--query', default='',
+                            help='Query string for --serializer')
+        parser.add_argument('--user', help='Email of the requesting user')
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=6,
+                            help='Objects per run for --serializer')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Create N recipes first, rolled back after')
+        parser.add_argument('--collapsed',
+                            help='Write sampled Python stacks to this file')
+        parser.add_argument('--field-collapsed',
+                            help='Write the serializer field tree to '
+                                 'this file, weighted by own time in us')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Sampling interval, ms')
+        parser.add_argument('--clock', choices=StackSampler.TIMERS,
+                            default='wall')
+
+    def handle(self, *args, **options):
+        self.options = options
+        try:
+            with transaction.atomic():
+                user = self.get_user()
+                if options['seed']:
+                    user = self.seed(options['seed'], user)
+                self.profile(user)
+                if options['seed']:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write('Seeded data rolled back')
+
+    def get_user(self):
+        if not self.options['user']:
+            return None
+        try:
+            return User.objects.get(email=self.options['user'])
+        except User.DoesNotExist:
+            raise CommandError('User does not exist')
+
+    def profile(self, user):
+        if self.options['serializer'] and user is None:
+            raise CommandError('--serializer requires --user or --seed')
+        run = (self.serializer_run(user) if self.options['serializer']
+               else self.endpoint_run(user))
+        run()
+        profiler = FieldProfiler()
+        sampler = StackSampler(self.options['interval'] / 1000,
+                               self.options['clock'])
+        with mock.patch.object(APIView, 'get_throttles', lambda view: []), \
+                profiler.activate(), sampler:
+            started = time.perf_counter()
+            for _ in range(self.options['runs']):
+                run()
+            elapsed = time.perf_counter() - started
+        self.report(profiler, elapsed)
+        self.write(self.options['collapsed'], sampler.collapsed())
+        self.write(self.options['field_collapsed'], profiler.collapsed())
+
+    def endpoint_run(self, user):
+        client = APIClient(SERVER_NAME=server_name())
+        if user is not None:
+            client.force_authenticate(user)
+        path = self.options['path']
+
+        def run():
+            response = client.get(path)
+            if response.status_code != 200:
+                raise CommandError(f'{path} returned {response.status_code}')
+        return run
+
+    def serializer_run(self, user):
+        viewset, action, path = SERIALIZER_TARGETS[self.options['serializer']]
+        request = Request(APIRequestFactory(SERVER_NAME=server_name()).get(
+            f'{path}?{self.options["query"]}'))
+        request.user = user
+        initkwargs = getattr(getattr(viewset, action), 'kwargs', {})
+        view = viewset(request=request, action=action, format_kwarg=None,
+                       kwargs={}, **initkwargs)
+        serializer_class = (initkwargs.get('serializer_class')
+                            or view.get_serializer_class())
+        limit = self.options['limit']
+
+        def run():
+            queryset = view.filter_queryset(view.get_queryset())[:limit]
+            serializer_class(queryset, many=True,
+                             context={'request': request}).data
+        return run
+
+    def report(self, profiler, elapsed):
+        runs = self.options['runs']
+        fields_total = sum(stats.total for path, stats in
+                           profiler.stats.items() if len(path) == 2)
+        self.stdout.write(
+            f'{"field":48} {"kind":24} {"calls":>7} {"total ms":>9} '
+            f'{"own ms":>8} {"own %":>6} {"queries":>7}')
+        for path, stats in sorted(profiler.stats.items(),
+                                  key=lambda item: -item[1].own):
+            self.stdout.write(
+                f'{".".join(path)[:48]:48} {stats.kind[:24]:24} '
+                f'{stats.calls / runs:>7.1f} '
+                f'{stats.total * 1000 / runs:>9.2f} '
+                f'{stats.own * 1000 / runs:>8.2f} '
+                f'{stats.own / elapsed if elapsed else 0:>6.1%} '
+                f'{stats.queries / runs:>7.1f}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{runs} runs, {elapsed * 1000 / runs:.2f} ms per run, '
+            f'{fields_total * 1000 / runs:.2f} ms in serializer fields, '
+            f'{profiler.queries / runs:.1f} queries per run '
+            '(calls, times and queries are per run)'))
+
+    def write(self, path, lines):
+        if not path:
+            return
+        with open(path, 'w', encoding='utf-8') as file:
+            for line in lines:
+                file.write(line + '\n')
+        self.stdout.write(f'Collapsed stacks written to {path}')
+
+    def seed(self, count, user):
+        """Авторы с рецептами, подписки, избранное и корзина"""
+        suffix = int(time.time())
+        if user is None:
+            user = User.objects.create(
+                email=f'profile-{suffix}@example.com',
+                username=f'profile-{suffix}')
+        authors = User.objects.bulk_create(
+            User(email=f'profile-{suffix}-{index}@example.com',
+                 username=f'profile-{suffix}-{index}')
+            for index in range(max(1, count // 10)))
+        tags = list(Tag.objects.all()[:3]) or Tag.objects.bulk_create(
+            Tag(name=f'profile-{suffix}-{index}', color=f'#00000{index}',
+                slug=f'profile-{suffix}-{index}') for index in range(3))
+        ingredients = list(Ingredient.objects.all()[:200])
+        if len(ingredients) < 10:
+            ingredients += Ingredient.objects.bulk_create(
+                Ingredient(name=f'profile-{suffix}-{index}',
+                           measurement_unit='г') for index in range(10))
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=random.choice(authors), name=f'Рецепт {index}',
+                   text='Текст рецепта', image='recipes/images/profile.png',
+                   cooking_time=random.randint(1, 120))
+            for index in range(count))
+        Products.objects.bulk_create(
+            Products(recipe=recipe, ingredient=ingredient,
+                     amount=random.randint(1, 500))
+            for recipe in recipes
+            for ingredient in random.sample(ingredients, 5))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk)
+            for recipe in recipes
+            for tag in random.sample(tags, min(2, len(tags))))
+        Follow.objects.bulk_create(
+            Follow(user=user, author=author) for author in authors)
+        Favorites.objects.bulk_create(
+            Favorites(user=user, recipe=recipe) for recipe in recipes[::2])
+        ShoppingList.objects.bulk_create(
+            ShoppingList(user=user, recipe=recipe)
+            for recipe in recipes[::3])
+        return user
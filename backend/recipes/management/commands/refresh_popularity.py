@@ -0,0 +1,89 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from recipes.constants import (FAVORITE_WEIGHT, POPULARITY_HALF_LIFE_DAYS,
+                               POPULARITY_WINDOW_DAYS, SHOPPING_LIST_WEIGHT)
+from recipes.models import (Favorites, Recipe, RecipePopularity,
+                            ShoppingList)
+
+
+class Command(BaseCommand):
+
+    help = 'Recalculate the popular and trending recipes leaderboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--half-life-days', type=float,
+                            default=POPULARITY_HALF_LIFE_DAYS)
+        parser.add_argument('--window-days', type=int,
+                            default=POPULARITY_WINDOW_DAYS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        since = timezone.now() - timedelta(days=options['window_days'])
+        half_life = options['half_life_days']
+        scores = defaultdict(float)
+        counts = defaultdict(lambda: {'favorites_count': 0,
+                                      'shopping_count': 0})
+        for model, weight, counter in (
+                (Favorites, FAVORITE_WEIGHT, 'favorites_count'),
+                (ShoppingList, SHOPPING_LIST_WEIGHT, 'shopping_count')):
+            totals = model.objects.filter(recipe__isnull=False).values(
+                'recipe').annotate(count=Count('id')).order_by()
+            for row in totals.iterator():
+                counts[row['recipe']][counter] = row['count']
+            daily = model.objects.filter(
+                recipe__isnull=False, added__gte=since
+            ).annotate(day=TruncDate('added')).values(
+                'recipe', 'day').annotate(count=Count('id')).order_by()
+            for row in daily.iterator():
+                age = (today - row['day']).days
+                scores[row['recipe']] += (
+                    weight * row['count'] * 0.5 ** (age / half_life))
+        leaderboard = [
+            RecipePopularity(
+                recipe_id=recipe_id,
+                score=scores.get(recipe_id, 0),
+                total=(values['favorites_count']
+                       + values['shopping_count']),
+                **values)
+            for recipe_id, values in counts.items()
+        ]
+        # Места уникальны: страницы читаются по индексу с места
+        # последнего рецепта предыдущей страницы
+        for rank_field, key in (('score_rank', 'score'),
+                                ('total_rank', 'total')):
+            leaderboard.sort(key=lambda row: (getattr(row, key),
+                                              row.recipe_id), reverse=True)
+            for rank, row in enumerate(leaderboard, 1):
+                setattr(row, rank_field, rank)
+        with transaction.atomic():
+            RecipePopularity.objects.all().delete()
+            RecipePopularity.objects.bulk_create(
+                leaderboard, batch_size=options['batch_size'])
+        updated = self.update_recipes(
+            {row.recipe_id: row.total for row in leaderboard},
+            options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Leaderboard refreshed: {len(leaderboard)} recipes, '
+            f'{updated} recipe rows updated'))
+
+    @staticmethod
+    def update_recipes(totals, batch_size):
+        """Счётчик в строке рецепта для сортировки по индексу"""
+        current = dict(Recipe.all_objects.filter(
+            popularity_total__gt=0).values_list('pk', 'popularity_total'))
+        changed = [Recipe(pk=pk, popularity_total=total)
+                   for pk, total in totals.items()
+                   if current.get(pk, 0) != total]
+        changed += [Recipe(pk=pk, popularity_total=0)
+                    for pk in current if pk not in totals]
+        Recipe.all_objects.bulk_update(changed, ('popularity_total',),
+                                       batch_size=batch_size)
+        return len(changed)
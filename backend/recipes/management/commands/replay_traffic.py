@@ -0,0 +1,119 @@
+import json
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+ID_PATTERN = re.compile(r'/\d+(?=/)')
+
+
+def endpoint(record):
+    return f'{record["method"]} {ID_PATTERN.sub("/{id}", record["path"])}'
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+
+    help = 'Replay captured API traffic and report latency per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='JSONL file with captured requests')
+        parser.add_argument('--base-url', default='http://localhost:8000')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--limit', type=int,
+                            help='Replay only the first N requests')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--token',
+                            help='Token for all authenticated requests')
+        parser.add_argument('--tokens',
+                            help='JSON file mapping captured users to tokens')
+        parser.add_argument('--skip-writes', action='store_true',
+                            help='Replay only GET requests')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.tokens = {}
+        if options['tokens']:
+            with open(options['tokens'], encoding='utf-8') as file:
+                self.tokens = json.load(file)
+        records = self.read(options['file'])
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(self.send, records))
+        elapsed = time.perf_counter() - started
+        self.report(results, elapsed)
+
+    def read(self, path):
+        records = []
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if self.options['skip_writes'] and record['method'] != 'GET':
+                    continue
+                records.append(record)
+                if self.options['limit'] and (
+                        len(records) >= self.options['limit']):
+                    break
+        return records
+
+    def send(self, record):
+        url = self.options['base_url'].rstrip('/') + record['path']
+        if record['query']:
+            url += '?' + record['query']
+        headers = {}
+        data = None
+        if record['body'] is not None:
+            data = json.dumps(record['body']).encode()
+            headers['Content-Type'] = 'application/json'
+        token = self.tokens.get(record['user'] or '', self.options['token'])
+        if record['user'] and token:
+            headers['Authorization'] = f'Token {token}'
+        request = Request(url, data=data, headers=headers,
+                          method=record['method'])
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=self.options['timeout']) as response:
+                response.read()
+                status = response.status
+        except HTTPError as error:
+            status = error.code
+        except (URLError, OSError):
+            status = None
+        return (endpoint(record), status,
+                (time.perf_counter() - started) * 1000)
+
+    def report(self, results, elapsed):
+        by_endpoint = defaultdict(list)
+        for name, status, duration in results:
+            by_endpoint[name].append((status, duration))
+        self.stdout.write(
+            f'{"endpoint":50} {"count":>6} {"p50":>8} {"p95":>8} '
+            f'{"p99":>8} {"4xx":>6} {"5xx":>6} {"fail":>6}')
+        for name, rows in sorted(by_endpoint.items(),
+                                 key=lambda item: -len(item[1])):
+            durations = sorted(duration for _, duration in rows)
+            client_errors = sum(1 for status, _ in rows
+                                if status and 400 <= status < 500)
+            server_errors = sum(1 for status, _ in rows
+                                if status and status >= 500)
+            failures = sum(1 for status, _ in rows if status is None)
+            self.stdout.write(
+                f'{name[:50]:50} {len(rows):>6} '
+                f'{percentile(durations, 0.5):>8.1f} '
+                f'{percentile(durations, 0.95):>8.1f} '
+                f'{percentile(durations, 0.99):>8.1f} '
+                f'{client_errors / len(rows):>6.1%} '
+                f'{server_errors / len(rows):>6.1%} '
+                f'{failures / len(rows):>6.1%}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed {len(results)} requests in {elapsed:.1f} s '
+            f'({len(results) / elapsed if elapsed else 0:.1f} req/s)'))
@@ -0,0 +1,78 @@
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from api.warmup import warm_up
+
+
+class Command(BaseCommand):
+
+    help = 'Measure time to first fast response for cold and warm starts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/recipes/')
+        parser.add_argument('--fast-ms', type=float, default=50.0,
+                            help='Response time considered fast')
+        parser.add_argument('--max-requests', type=int, default=50)
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--child', action='store_true',
+                            help='Internal: run a single measured start')
+        parser.add_argument('--warm', action='store_true',
+                            help='Internal: warm up before the first request')
+
+    def handle(self, *args, **options):
+        if options['child']:
+            return self.run_child(options)
+        for mode in ('cold', 'warm'):
+            results = [self.spawn(mode, options)
+                       for _ in range(options['runs'])]
+            first = [result['first_fast'] for result in results
+                     if result['first_fast'] is not None]
+            self.stdout.write(
+                f'{mode}: first response '
+                f'{statistics.median(r["first"] for r in results):.1f} ms, '
+                f'first fast response '
+                + (f'{statistics.median(first):.1f} ms after spawn'
+                   if first else 'not reached')
+                + f' (median of {len(results)} runs)')
+
+    def spawn(self, mode, options):
+        command = [sys.executable, sys.argv[0], 'startup_benchmark',
+                   '--child', '--path', options['path'],
+                   '--fast-ms', str(options['fast_ms']),
+                   '--max-requests', str(options['max_requests'])]
+        if mode == 'warm':
+            command.append('--warm')
+        spawned = time.time()
+        output = subprocess.run(command, capture_output=True, text=True,
+                                check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if result['first_fast'] is not None:
+            result['first_fast'] = (result['first_fast'] - spawned) * 1000
+        return result
+
+    def run_child(self, options):
+        if options['warm']:
+            warm_up()
+        host = next((host for host in settings.ALLOWED_HOSTS
+                     if host and host != '*'), 'localhost')
+        client = Client(HTTP_HOST=host)
+        first = None
+        first_fast = None
+        for _ in range(options['max_requests']):
+            started = time.perf_counter()
+            client.get(options['path'])
+            elapsed = (time.perf_counter() - started) * 1000
+            if first is None:
+                first = elapsed
+            if elapsed <= options['fast_ms']:
+                first_fast = time.time()
+                break
+        self.stdout.write(json.dumps({'first': first,
+                                      'first_fast': first_fast}))
@@ -1,9 +1,13 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.dispatch import Signal
+from django.utils import timezone
 from django.core.validators import (MinValueValidator,
                                     MaxValueValidator)
 
-from recipes.constants import MIN_VAL, MAX_VAL
+from recipes.constants import MAX_VAL, MIN_VAL, RECIPE_INDEX_MAX_CHANGES
 
 User = get_user_model()
 
@@ -62,8 +66,44 @@ class Tag(models.Model):
         return self.name
 
 
+recipes_updated = Signal()
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Рецепты с оповещением об update() полей индекса рецептов"""
+    INDEXED_FIELDS = frozenset(('author', 'author_id', 'cooking_time',
+                                'pub_date', 'is_hidden'))
+
+    def update(self, **kwargs):
+        if (not settings.RECIPE_INDEX_ENABLED
+                or self.INDEXED_FIELDS.isdisjoint(kwargs)):
+            return super().update(**kwargs)
+        # Больше RECIPE_INDEX_MAX_CHANGES id означает полную перестройку
+        recipe_ids = list(self.values_list(
+            'pk', flat=True)[:RECIPE_INDEX_MAX_CHANGES + 1])
+        rows = super().update(**kwargs)
+        recipes_updated.send(sender=self.model, recipe_ids=recipe_ids)
+        return rows
+
+
+class VisibleRecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+    """Рецепты без скрытых в ожидании удаления"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_hidden=False)
+
+
 class Recipe(models.Model):
     """Модель рецептов"""
+    PENDING = 'pending'
+    PUSHED = 'pushed'
+    PULLED = 'pulled'
+    FEED_DELIVERIES = (
+        (PENDING, 'Ожидает рассылки'),
+        (PUSHED, 'Разослан в ленты'),
+        (PULLED, 'Читается из ленты автора'),
+    )
+
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -115,8 +155,56 @@ class Recipe(models.Model):
         verbose_name='Дата публикации'
     )
 
+    updated = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения'
+    )
+
+    is_hidden = models.BooleanField(
+        default=False,
+        verbose_name='Скрыт до удаления'
+    )
+
+    popularity_total = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в избранное и корзину'
+    )
+
+    feed_delivery = models.CharField(
+        max_length=7,
+        choices=FEED_DELIVERIES,
+        default=PENDING,
+        verbose_name='Доставка в ленты'
+    )
+
+    objects = VisibleRecipeManager()
+    all_objects = RecipeQuerySet.as_manager()
+
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         condition=models.Q(is_hidden=False),
+                         name='recipe_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date'),
+                         condition=models.Q(is_hidden=False),
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=('cooking_time', 'id'),
+                         condition=models.Q(is_hidden=False),
+                         name='recipe_cooking_time_idx'),
+            models.Index(fields=('name', 'id'),
+                         condition=models.Q(is_hidden=False),
+                         name='recipe_name_idx'),
+            models.Index(fields=('popularity_total', 'id'),
+                         condition=models.Q(is_hidden=False),
+                         name='recipe_popularity_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         condition=models.Q(
+                             is_hidden=False,
+                             feed_delivery__in=('pending', 'pulled')),
+                         name='recipe_feed_pull_idx'),
+        )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -198,6 +286,12 @@ class Favorites(models.Model):
         verbose_name='Рецепты'
     )
 
+    added = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления'
+    )
+
     class Meta:
         ordering = ('id',)
         verbose_name = 'Избранное'
@@ -224,6 +318,12 @@ class ShoppingList(models.Model):
         verbose_name='Рецепт'
     )
 
+    added = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления'
+    )
+
     class Meta:
         ordering = ('id',)
         verbose_name = 'Список покупок'
@@ -231,3 +331,592 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'Список покупок {self.user}'
+
+
+class RecipePopularity(models.Model):
+    """Модель рейтинга популярности рецептов"""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularity',
+        verbose_name='Рецепт'
+    )
+
+    score = models.FloatField(
+        default=0,
+        verbose_name='Рейтинг с затуханием'
+    )
+
+    total = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Всего добавлений'
+    )
+
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='В избранном'
+    )
+
+    shopping_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='В списках покупок'
+    )
+
+    score_rank = models.PositiveIntegerField(
+        unique=True,
+        verbose_name='Место по рейтингу'
+    )
+
+    total_rank = models.PositiveIntegerField(
+        unique=True,
+        verbose_name='Место по добавлениям'
+    )
+
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата пересчёта'
+    )
+
+    class Meta:
+        ordering = ('score_rank',)
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+
+    def __str__(self):
+        return f'{self.recipe} - {self.score:.2f}'
+
+
+class FeedEntry(models.Model):
+    """Модель ленты рецептов подписок"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик'
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        ordering = ('-pub_date',)
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'recipe'),
+                                    name='unique_feed_entry'),
+        )
+        indexes = (
+            models.Index(fields=('user', '-pub_date', '-recipe'),
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=('user', 'author'),
+                         name='feed_user_author_idx'),
+        )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+    def __str__(self):
+        return f'{self.user_id} - {self.recipe_id}'
+
+
+class ShoppingListExport(models.Model):
+    """Модель задания на выгрузку списка покупок"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+    PDF = 'pdf'
+    TXT = 'txt'
+    FORMATS = (
+        (PDF, 'PDF'),
+        (TXT, 'Текст'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_exports',
+        verbose_name='Пользователь'
+    )
+
+    file_format = models.CharField(
+        max_length=3,
+        choices=FORMATS,
+        default=PDF,
+        verbose_name='Формат'
+    )
+
+    fingerprint = models.CharField(
+        max_length=64,
+        verbose_name='Отпечаток списка покупок'
+    )
+
+    status = models.CharField(
+        max_length=7,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус'
+    )
+
+    file = models.FileField(
+        upload_to='shopping_lists/',
+        blank=True,
+        verbose_name='Файл'
+    )
+
+    error = models.TextField(
+        blank=True,
+        verbose_name='Ошибка'
+    )
+
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+
+    queued = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Дата постановки в очередь'
+    )
+
+    started = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата запуска'
+    )
+
+    finished = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата завершения'
+    )
+
+    class Meta:
+        ordering = ('-created',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'fingerprint', 'file_format'),
+                condition=~models.Q(status='failed'),
+                name='unique_shopping_list_export'),
+        )
+        verbose_name = 'Выгрузка списка покупок'
+        verbose_name_plural = 'Выгрузки списков покупок'
+
+    def __str__(self):
+        return f'{self.user} - {self.file_format} - {self.status}'
+
+
+class RecipeSignature(models.Model):
+    """Модель MinHash-сигнатуры набора ингредиентов рецепта"""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+        verbose_name='Рецепт'
+    )
+
+    ingredients_hash = models.CharField(
+        max_length=64,
+        verbose_name='Отпечаток ингредиентов'
+    )
+
+    minhash = models.BinaryField(
+        verbose_name='Сигнатура'
+    )
+
+    class Meta:
+        verbose_name = 'Сигнатура рецепта'
+        verbose_name_plural = 'Сигнатуры рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id}'
+
+
+class SimilarityBucket(models.Model):
+    """Модель LSH-корзины для поиска похожих рецептов"""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarity_buckets',
+        verbose_name='Рецепт'
+    )
+
+    band = models.PositiveSmallIntegerField(
+        verbose_name='Полоса'
+    )
+
+    bucket = models.BigIntegerField(
+        verbose_name='Корзина'
+    )
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('band', 'bucket'),
+                         name='similarity_band_bucket_idx'),
+        )
+        verbose_name = 'Корзина похожих рецептов'
+        verbose_name_plural = 'Корзины похожих рецептов'
+
+    def __str__(self):
+        return f'{self.band}:{self.bucket} - {self.recipe_id}'
+
+
+class SimilarityIndexRun(models.Model):
+    """Модель запуска пересчёта сигнатур похожих рецептов"""
+    started = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата запуска'
+    )
+
+    finished = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата завершения'
+    )
+
+    updated = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Пересчитано сигнатур'
+    )
+
+    class Meta:
+        ordering = ('-started',)
+        verbose_name = 'Пересчёт похожих рецептов'
+        verbose_name_plural = 'Пересчёты похожих рецептов'
+
+    def __str__(self):
+        return f'{self.started} - {self.updated}'
+
+
+class IdempotencyKey(models.Model):
+    """Модель ключа идемпотентности запроса"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+        verbose_name='Пользователь'
+    )
+
+    key = models.CharField(
+        max_length=255,
+        verbose_name='Ключ'
+    )
+
+    fingerprint = models.CharField(
+        max_length=64,
+        verbose_name='Отпечаток запроса'
+    )
+
+    status_code = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Код ответа'
+    )
+
+    response = models.JSONField(
+        null=True,
+        blank=True,
+        encoder=DjangoJSONEncoder,
+        verbose_name='Тело ответа'
+    )
+
+    created = models.DateTimeField(
+        db_index=True,
+        verbose_name='Дата создания'
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'key'),
+                                    name='unique_idempotency_key'),
+        )
+        verbose_name = 'Ключ идемпотентности'
+        verbose_name_plural = 'Ключи идемпотентности'
+
+    def __str__(self):
+        return f'{self.user} - {self.key}'
+
+
+class DeletionJob(models.Model):
+    """Модель задания на фоновое удаление пользователя или рецепта"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+    RECIPE = 'recipe'
+    USER = 'user'
+    TARGETS = (
+        (RECIPE, 'Рецепт'),
+        (USER, 'Пользователь'),
+    )
+
+    target = models.CharField(
+        max_length=6,
+        choices=TARGETS,
+        verbose_name='Объект'
+    )
+
+    object_id = models.PositiveIntegerField(
+        verbose_name='Id объекта'
+    )
+
+    status = models.CharField(
+        max_length=7,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус'
+    )
+
+    deleted = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Удалено строк'
+    )
+
+    step = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Текущая таблица'
+    )
+
+    error = models.TextField(
+        blank=True,
+        verbose_name='Ошибка'
+    )
+
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата обновления'
+    )
+
+    finished = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата завершения'
+    )
+
+    class Meta:
+        ordering = ('-created',)
+        constraints = (
+            models.UniqueConstraint(fields=('target', 'object_id'),
+                                    name='unique_deletion_job'),
+        )
+        verbose_name = 'Задание на удаление'
+        verbose_name_plural = 'Задания на удаление'
+
+    def __str__(self):
+        return f'{self.target} {self.object_id} - {self.status}'
+
+
+class ChangeLogEntry(models.Model):
+    """Модель записи журнала изменений избранного, корзины и подписок"""
+    FAVORITES = 'favorites'
+    SHOPPING_CART = 'shopping_cart'
+    SUBSCRIPTIONS = 'subscriptions'
+    KINDS = (
+        (FAVORITES, 'Избранное'),
+        (SHOPPING_CART, 'Корзина'),
+        (SUBSCRIPTIONS, 'Подписки'),
+    )
+    ADD = 'add'
+    REMOVE = 'remove'
+    ACTIONS = (
+        (ADD, 'Добавление'),
+        (REMOVE, 'Удаление'),
+    )
+
+    id = models.BigAutoField(
+        primary_key=True
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='change_log',
+        verbose_name='Пользователь'
+    )
+
+    kind = models.CharField(
+        max_length=13,
+        choices=KINDS,
+        verbose_name='Список'
+    )
+
+    object_id = models.PositiveIntegerField(
+        verbose_name='Id рецепта или автора'
+    )
+
+    action = models.CharField(
+        max_length=6,
+        choices=ACTIONS,
+        verbose_name='Действие'
+    )
+
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата изменения'
+    )
+
+    class Meta:
+        ordering = ('id',)
+        indexes = (
+            models.Index(fields=('user', 'id'),
+                         name='change_log_user_id_idx'),
+        )
+        verbose_name = 'Запись журнала изменений'
+        verbose_name_plural = 'Журнал изменений'
+
+    def __str__(self):
+        return f'{self.user} - {self.kind} {self.action} {self.object_id}'
+
+
+class ChangeLogCompaction(models.Model):
+    """Модель отметки о сжатии журнала изменений"""
+    version = models.BigIntegerField(
+        db_index=True,
+        verbose_name='Последняя удалённая версия'
+    )
+
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата сжатия'
+    )
+
+    class Meta:
+        ordering = ('-version',)
+        verbose_name = 'Сжатие журнала изменений'
+        verbose_name_plural = 'Сжатия журнала изменений'
+
+    def __str__(self):
+        return f'{self.version}'
+
+
+class CacheVersion(models.Model):
+    """Модель версии кэшированных данных, общей для всех процессов"""
+    key = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Ключ'
+    )
+
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Версия'
+    )
+
+    class Meta:
+        verbose_name = 'Версия кэша'
+        verbose_name_plural = 'Версии кэша'
+
+    def __str__(self):
+        return f'{self.key} - {self.version}'
+
+
+class ImportCheckpoint(models.Model):
+    """Модель прогресса импорта рецептов из файла"""
+    source = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Источник'
+    )
+
+    lines = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Обработано строк'
+    )
+
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата обновления'
+    )
+
+    class Meta:
+        verbose_name = 'Прогресс импорта'
+        verbose_name_plural = 'Прогресс импорта'
+
+    def __str__(self):
+        return f'{self.source} - {self.lines}'
+
+
+class ImportedRecipe(models.Model):
+    """Модель соответствия id рецепта в источнике и в базе"""
+    source = models.CharField(
+        max_length=255,
+        verbose_name='Источник'
+    )
+
+    source_id = models.PositiveIntegerField(
+        verbose_name='Id в источнике'
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рецепт'
+    )
+
+    class Meta:
+        ordering = ('source', 'source_id')
+        constraints = (
+            models.UniqueConstraint(fields=('source', 'source_id'),
+                                    name='unique_imported_recipe'),
+        )
+        verbose_name = 'Импортированный рецепт'
+        verbose_name_plural = 'Импортированные рецепты'
+
+    def __str__(self):
+        return f'{self.source} {self.source_id} - {self.recipe_id}'
+
+
+class RecipeIndexChange(models.Model):
+    """Модель журнала изменений для индексов рецептов в процессах API.
+
+    Id записи служит версией индекса; recipe_id 0 - полная перестройка.
+    """
+    id = models.BigAutoField(
+        primary_key=True
+    )
+
+    recipe_id = models.BigIntegerField(
+        verbose_name='Id рецепта'
+    )
+
+    class Meta:
+        verbose_name = 'Изменение индекса рецептов'
+        verbose_name_plural = 'Изменения индекса рецептов'
+
+    def __str__(self):
+        return f'{self.id} - {self.recipe_id}'
@@ -0,0 +1,35 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from recipes.constants import ESTIMATED_COUNT_THRESHOLD
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор с оценкой числа строк по статистике PostgreSQL.
+
+    Для больших таблиц без фильтров вместо COUNT(*) берётся reltuples,
+    для остальных запросов считается точное значение. Фильтр менеджера
+    по умолчанию (скрытые рецепты) фильтром не считается: скрытых строк
+    мало, и на оценку они почти не влияют.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and self.is_unfiltered(queryset):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    (queryset.model._meta.db_table,))
+                row = cursor.fetchone()
+            if row and row[0] >= ESTIMATED_COUNT_THRESHOLD:
+                return int(row[0])
+        return super().count
+
+    @staticmethod
+    def is_unfiltered(queryset):
+        where = queryset.query.where
+        return not where or where == (
+            queryset.model._default_manager.all().query.where)
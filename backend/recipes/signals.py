@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.changelog import LOGGED_RELATIONS, log_change
+from recipes.columnar import FULL_REBUILD, mark_changed
+from recipes.constants import RECIPE_INDEX_MAX_CHANGES
+from recipes.feed import backfill_feed, clean_feed, fan_out_recipe
+from recipes.models import (ChangeLogEntry, Follow, Recipe, Tag,
+                            recipes_updated)
+from recipes.tasks import run_in_background
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        run_in_background(fan_out_recipe, instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        run_in_background(backfill_feed, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    run_in_background(clean_feed, instance.user_id, instance.author_id)
+
+
+def mark_index_changed(recipe_ids=(FULL_REBUILD,)):
+    """Отметка изменений для индексов рецептов в процессах API"""
+    if not settings.RECIPE_INDEX_ENABLED:
+        return
+    if len(recipe_ids) > RECIPE_INDEX_MAX_CHANGES:
+        recipe_ids = (FULL_REBUILD,)
+
+    transaction.on_commit(lambda: mark_changed(recipe_ids))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    mark_index_changed((instance.pk,))
+
+
+@receiver(recipes_updated, sender=Recipe)
+def recipes_bulk_changed(sender, recipe_ids, **kwargs):
+    if recipe_ids:
+        mark_index_changed(tuple(recipe_ids))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        mark_index_changed((instance.pk,))
+    elif pk_set:
+        mark_index_changed(tuple(pk_set))
+    else:
+        mark_index_changed()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    mark_index_changed()
+
+
+def relation_added(sender, instance, created, **kwargs):
+    if created:
+        log_change(instance, ChangeLogEntry.ADD)
+
+
+def relation_removed(sender, instance, **kwargs):
+    log_change(instance, ChangeLogEntry.REMOVE)
+
+
+for model in LOGGED_RELATIONS:
+    post_save.connect(relation_added, sender=model)
+    post_delete.connect(relation_removed, sender=model)
@@ -0,0 +1,125 @@
+import hashlib
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from recipes.constants import (MINHASH_BANDS, MINHASH_PERMUTATIONS,
+                               MINHASH_SEED, SIMILAR_MAX_CANDIDATES,
+                               SIMILARITY_WATERMARK_OVERLAP)
+from recipes.models import (Products, Recipe, RecipeSignature,
+                            SimilarityBucket, SimilarityIndexRun)
+
+PRIME = (1 << 31) - 1
+ROWS_PER_BAND = MINHASH_PERMUTATIONS // MINHASH_BANDS
+
+_random = np.random.RandomState(MINHASH_SEED)
+COEFFICIENTS = _random.randint(
+    1, PRIME, MINHASH_PERMUTATIONS).astype(np.uint64)
+OFFSETS = _random.randint(0, PRIME, MINHASH_PERMUTATIONS).astype(np.uint64)
+
+
+def ingredients_hash(ingredient_ids):
+    return hashlib.sha256(
+        ','.join(map(str, sorted(ingredient_ids))).encode()).hexdigest()
+
+
+def minhash(ingredient_sets):
+    """MinHash-сигнатуры пачки непустых наборов ингредиентов.
+
+    Все наборы хешируются одной матричной операцией, минимумы
+    по каждому набору берутся через np.minimum.reduceat.
+    """
+    sizes = np.fromiter(map(len, ingredient_sets), dtype=np.int64)
+    ids = np.fromiter((pk for ids in ingredient_sets for pk in ids),
+                      dtype=np.uint64, count=int(sizes.sum()))
+    hashes = (ids[:, None] * COEFFICIENTS + OFFSETS) % PRIME
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    return np.minimum.reduceat(hashes, starts, axis=0).astype(np.uint32)
+
+
+def band_buckets(signature):
+    for band in range(MINHASH_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(rows.tobytes(), digest_size=8).digest()
+        yield band, int.from_bytes(digest, 'big', signed=True)
+
+
+def load_signature(data):
+    return np.frombuffer(bytes(data), dtype=np.uint32)
+
+
+def index_recipes(recipe_ids, full=False):
+    """Пересчёт сигнатур рецептов, у которых изменились ингредиенты"""
+    ingredient_sets = {pk: set() for pk in recipe_ids}
+    for recipe_id, ingredient_id in Products.objects.filter(
+            recipe_id__in=recipe_ids).values_list(
+                'recipe_id', 'ingredient_id'):
+        ingredient_sets[recipe_id].add(ingredient_id)
+    known = dict(RecipeSignature.objects.filter(
+        recipe_id__in=recipe_ids).values_list('recipe_id',
+                                              'ingredients_hash'))
+    hashes = {pk: ingredients_hash(ids)
+              for pk, ids in ingredient_sets.items()}
+    changed = [pk for pk in recipe_ids
+               if full or known.get(pk) != hashes[pk]]
+    if not changed:
+        return 0
+    filled = [pk for pk in changed if ingredient_sets[pk]]
+    signatures = (minhash([sorted(ingredient_sets[pk]) for pk in filled])
+                  if filled else [])
+    with transaction.atomic():
+        RecipeSignature.objects.filter(recipe_id__in=changed).delete()
+        SimilarityBucket.objects.filter(recipe_id__in=changed).delete()
+        RecipeSignature.objects.bulk_create(
+            RecipeSignature(recipe_id=pk, ingredients_hash=hashes[pk],
+                            minhash=signature.tobytes())
+            for pk, signature in zip(filled, signatures))
+        SimilarityBucket.objects.bulk_create(
+            SimilarityBucket(recipe_id=pk, band=band, bucket=bucket)
+            for pk, signature in zip(filled, signatures)
+            for band, bucket in band_buckets(signature))
+    return len(changed)
+
+
+def dirty_recipes():
+    """Рецепты, изменённые после начала последнего завершённого пересчёта.
+
+    Продукты пишутся только вместе с рецептом, поэтому их изменения
+    видны по Recipe.updated. Окно перекрытия покрывает транзакции,
+    которые начались до пересчёта, а закоммитились после него;
+    неизменившиеся наборы отсеиваются сравнением отпечатков.
+    Без завершённых пересчётов отдаются все рецепты.
+    """
+    started = SimilarityIndexRun.objects.filter(
+        finished__isnull=False).values_list('started', flat=True).first()
+    if started is None:
+        return Recipe.objects.all()
+    return Recipe.objects.filter(updated__gte=started - timedelta(
+        seconds=SIMILARITY_WATERMARK_OVERLAP))
+
+
+def find_similar(recipe_id, limit):
+    """Id похожих рецептов по убыванию оценки сходства Жаккара"""
+    signature = RecipeSignature.objects.filter(
+        recipe_id=recipe_id).values_list('minhash', flat=True).first()
+    if signature is None:
+        return []
+    signature = load_signature(signature)
+    lookup = reduce(or_, (Q(band=band, bucket=bucket)
+                          for band, bucket in band_buckets(signature)))
+    candidates = SimilarityBucket.objects.filter(lookup).exclude(
+        recipe_id=recipe_id).values_list(
+            'recipe_id', flat=True).distinct()[:SIMILAR_MAX_CANDIDATES]
+    rows = list(RecipeSignature.objects.filter(
+        recipe_id__in=list(candidates)).values_list('recipe_id', 'minhash'))
+    if not rows:
+        return []
+    ids = np.array([pk for pk, _ in rows])
+    matrix = np.stack([load_signature(data) for _, data in rows])
+    scores = (matrix == signature).mean(axis=1)
+    order = np.lexsort((ids, -scores))[:limit]
+    return ids[order].tolist()
@@ -0,0 +1,50 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from recipes.models import ShoppingListExport
+from recipes.tests.utils import create_recipe, create_user
+
+
+class CleanMediaTest(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = create_user()
+
+    def create_file(self, name):
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(b'data')
+        os.utime(path, (0, 0))
+        return name
+
+    def clean(self, *args):
+        call_command('clean_media', '--delete', *args, stdout=StringIO(),
+                     stderr=StringIO())
+
+    def test_default_run_covers_legacy_directory(self):
+        kept = self.create_file('recipes/kept.png')
+        orphan = self.create_file('recipes/orphan.png')
+        current = self.create_file('media/orphan.png')
+        create_recipe(self.user, image=kept)
+        self.clean()
+        self.assertTrue(default_storage.exists(kept))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(default_storage.exists(current))
+
+    def test_files_of_other_models_are_kept(self):
+        export = self.create_file('shopping_lists/list.pdf')
+        ShoppingListExport.objects.create(
+            user=self.user, file_format='pdf', file=export)
+        self.clean('--directory', '')
+        self.assertTrue(default_storage.exists(export))
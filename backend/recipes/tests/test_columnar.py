@@ -0,0 +1,116 @@
+from datetime import timedelta
+from itertools import product
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.throttling import CostThrottle
+from recipes import columnar, signals
+from recipes.models import Favorites, Recipe, ShoppingList, Tag
+from recipes.tests.utils import create_recipe, create_user
+
+START = timezone.now() - timedelta(days=30)
+
+FILTERS = (
+    {},
+    {'tags': ['breakfast']},
+    {'tags': ['breakfast', 'dinner']},
+    {'is_favorited': 1},
+    {'is_in_shopping_cart': 1},
+    {'is_favorited': 1, 'is_in_shopping_cart': 1},
+    {'cooking_time_min': 20},
+    {'cooking_time_min': 15, 'cooking_time_max': 40},
+    {'pub_date_after': (START + timedelta(days=5)).isoformat()},
+    {'pub_date_after': (START + timedelta(days=3)).isoformat(),
+     'pub_date_before': (START + timedelta(days=12)).isoformat()},
+    {'tags': ['dinner'], 'cooking_time_max': 30, 'is_favorited': 1},
+)
+
+
+class RecipeIndexTest(TestCase):
+    """Список по индексу рецептов совпадает со списком из ORM"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        authors = [create_user() for _ in range(3)]
+        tags = [Tag.objects.create(name=slug, slug=slug, color='#000000')
+                for slug in ('breakfast', 'dinner', 'dessert')]
+        for number in range(18):
+            recipe = create_recipe(authors[number % 3],
+                                   cooking_time=5 + number * 3)
+            # Разные даты: ORM сортирует только по pub_date
+            Recipe.all_objects.filter(pk=recipe.pk).update(
+                pub_date=START + timedelta(days=number),
+                is_hidden=number == 7)
+            recipe.tags.set(tags[:number % 4])
+            if number % 2:
+                Favorites.objects.create(user=cls.user, recipe=recipe)
+            if number % 3 == 0:
+                ShoppingList.objects.create(user=cls.user, recipe=recipe)
+        cls.author_ids = [author.pk for author in authors]
+
+    def setUp(self):
+        # Версии кэша тэгов откатываются вместе с транзакцией теста
+        cache.clear()
+        self.index = columnar.RecipeIndex()
+        for patcher in (
+                mock.patch.object(columnar, '_index', self.index),
+                # Сотни запросов одного клиента - не то, что здесь проверяется
+                mock.patch.object(CostThrottle, 'allow_request',
+                                  return_value=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fetch(self, params, indexed):
+        results = []
+        with override_settings(RECIPE_INDEX_ENABLED=indexed):
+            for page in range(1, 5):
+                response = self.client.get('/api/recipes/', {
+                    **params, 'limit': 5, 'page': page, 'fields': 'id'})
+                if response.status_code == 404:
+                    break
+                self.assertEqual(response.status_code, 200)
+                results.append((response.data['count'], [
+                    recipe['id'] for recipe in response.data['results']]))
+        return results
+
+    def assert_matches_orm(self, params):
+        with self.subTest(params=params):
+            expected = self.fetch(params, indexed=False)
+            self.assertTrue(expected)
+            self.assertEqual(self.fetch(params, indexed=True), expected)
+
+    def test_filters_match_orm(self):
+        for params in FILTERS:
+            self.assert_matches_orm(params)
+        for author_id, params in product(self.author_ids, FILTERS[:4]):
+            self.assert_matches_orm({**params, 'author': author_id})
+
+    def test_index_is_used(self):
+        with override_settings(RECIPE_INDEX_ENABLED=True):
+            self.client.get('/api/recipes/')
+        self.assertIsNotNone(self.index.columns)
+        self.assertEqual(len(self.index.columns.ids),
+                         Recipe.objects.count())
+
+    @override_settings(RECIPE_INDEX_ENABLED=True)
+    def test_changes_reach_built_index(self):
+        self.fetch({}, indexed=True)
+        recipe = Recipe.objects.order_by('pk').first()
+        # Фоновая рассылка в ленты к индексу отношения не имеет
+        with mock.patch.object(signals, 'run_in_background'), \
+                self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.filter(pk=recipe.pk).update(cooking_time=100)
+            Recipe.objects.filter(author_id=self.author_ids[1]).update(
+                is_hidden=True)
+            recipe.tags.set(Tag.objects.filter(slug='dessert'))
+            create_recipe(recipe.author, cooking_time=90)
+        for params in ({}, {'cooking_time_min': 80},
+                       {'tags': ['dessert']}):
+            self.assert_matches_orm(params)
@@ -0,0 +1,107 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from recipes import deletion
+from recipes.deletion import run_deletion, schedule_deletion
+from recipes.models import (DeletionJob, Favorites, Follow, Ingredient,
+                            Products, Recipe, ShoppingList)
+from recipes.tests.utils import create_recipe, create_user
+from users.models import User
+
+
+def interrupted(after):
+    """purge, который падает после after пачек, как упавший воркер"""
+    purge = deletion.purge
+
+    def wrapper(*args, **kwargs):
+        for number, step in enumerate(purge(*args, **kwargs)):
+            if number == after:
+                raise RuntimeError('worker killed')
+            yield step
+    return wrapper
+
+
+@override_settings(DELETION_BATCH_SIZE=1)
+class DeletionJobTest(TestCase):
+    """Скрытие сразу, удаление пачками в фоне с продолжением"""
+
+    def setUp(self):
+        self.author = create_user()
+        self.reader = create_user()
+        self.recipe = create_recipe(self.author)
+        ingredient = Ingredient.objects.create(name='Соль',
+                                               measurement_unit='г')
+        Products.objects.create(recipe=self.recipe, ingredient=ingredient,
+                                amount=1)
+        Favorites.objects.create(user=self.reader, recipe=self.recipe)
+        ShoppingList.objects.create(user=self.reader, recipe=self.recipe)
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_recipe_is_hidden_until_purged(self):
+        job = schedule_deletion(self.recipe)
+        self.assertFalse(Recipe.objects.filter(pk=self.recipe.pk).exists())
+        self.assertTrue(
+            Recipe.all_objects.filter(pk=self.recipe.pk).exists())
+        run_deletion(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.DONE)
+        self.assertFalse(
+            Recipe.all_objects.filter(pk=self.recipe.pk).exists())
+        self.assertFalse(Favorites.objects.exists())
+        self.assertFalse(ShoppingList.objects.exists())
+        self.assertFalse(Products.objects.exists())
+        self.assertGreaterEqual(job.deleted, 4)
+
+    def test_user_purge_removes_dependent_rows(self):
+        job = schedule_deletion(self.author)
+        self.assertTrue(User.objects.get(pk=self.author.pk).is_hidden)
+        run_deletion(job.pk)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Recipe.all_objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertTrue(User.objects.filter(pk=self.reader.pk).exists())
+
+    def test_interrupted_job_resumes(self):
+        job = schedule_deletion(self.author)
+        with mock.patch.object(deletion, 'purge', interrupted(after=2)):
+            with self.assertRaises(RuntimeError):
+                run_deletion(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.FAILED)
+        self.assertTrue(User.objects.filter(pk=self.author.pk).exists())
+        run_deletion(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.DONE)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Recipe.all_objects.exists())
+
+    def test_command_resumes_abandoned_jobs(self):
+        stale = timezone.now() - timedelta(hours=1)
+        failing = schedule_deletion(self.recipe)
+        other = schedule_deletion(create_recipe(self.author))
+        DeletionJob.objects.filter(pk=failing.pk).update(
+            status=DeletionJob.RUNNING, created=stale, updated=stale)
+        DeletionJob.objects.filter(pk=other.pk).update(created=stale)
+        purge = deletion.purge
+
+        def failing_purge(model, lookup, value, *args):
+            if value == failing.object_id:
+                raise RuntimeError('broken')
+            return purge(model, lookup, value, *args)
+
+        stderr = StringIO()
+        with mock.patch.object(deletion, 'purge', failing_purge):
+            call_command('process_deletions', stdout=StringIO(),
+                         stderr=stderr)
+        self.assertIn('broken', stderr.getvalue())
+        self.assertEqual(DeletionJob.objects.get(pk=failing.pk).status,
+                         DeletionJob.FAILED)
+        self.assertEqual(DeletionJob.objects.get(pk=other.pk).status,
+                         DeletionJob.DONE)
+        self.assertFalse(
+            Recipe.all_objects.filter(pk=other.object_id).exists())
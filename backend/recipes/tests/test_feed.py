@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.feed import backfill_feed, fan_out_recipe
+from recipes.models import FeedEntry, Follow, Recipe
+from recipes.tests.utils import create_recipe, create_user
+
+
+class TimelineTest(TestCase):
+    """Лента по курсору совпадает с сортировкой рецептов подписок"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        pushed_author, pulled_author = create_user(), create_user()
+        Follow.objects.create(user=cls.user, author=pushed_author)
+        Follow.objects.create(user=cls.user, author=pulled_author)
+        now = timezone.now()
+        # Одинаковые даты в разных источниках проверяют разбор ничьих
+        for minutes in (0, 1, 1, 2, 3, 3, 4):
+            pub_date = now - timedelta(minutes=minutes)
+            for author in (pushed_author, pulled_author):
+                recipe = create_recipe(author)
+                Recipe.all_objects.filter(pk=recipe.pk).update(
+                    pub_date=pub_date)
+        for recipe_id in pushed_author.recipes.values_list('pk', flat=True):
+            fan_out_recipe(recipe_id)
+        pulled_author.recipes.update(feed_delivery=Recipe.PULLED)
+        cls.expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id').values_list('pk', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_follow_cursor(self):
+        ids = []
+        url = '/api/recipes/timeline/?limit=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, self.expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/timeline/?cursor=broken')
+        self.assertEqual(response.status_code, 404)
+
+
+class BackfillTest(TestCase):
+
+    def test_backfill_after_unfollow_adds_nothing(self):
+        user, author = create_user(), create_user()
+        recipe = create_recipe(author)
+        Recipe.all_objects.filter(pk=recipe.pk).update(
+            feed_delivery=Recipe.PUSHED)
+        Follow.objects.create(user=user, author=author).delete()
+        backfill_feed(user.pk, author.pk)
+        self.assertFalse(FeedEntry.objects.filter(user=user).exists())
+
+    def test_backfill_copies_recent_recipes(self):
+        user, author = create_user(), create_user()
+        recipe = create_recipe(author)
+        Follow.objects.create(user=user, author=author)
+        backfill_feed(user.pk, author.pk)
+        self.assertEqual(list(FeedEntry.objects.filter(
+            user=user).values_list('recipe_id', flat=True)), [recipe.pk])
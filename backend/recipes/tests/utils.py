@@ -0,0 +1,22 @@
+from itertools import count
+
+from recipes.models import Recipe
+from users.models import User
+
+_numbers = count(1)
+
+
+def create_user(**fields):
+    number = next(_numbers)
+    fields = {'username': f'user{number}',
+              'email': f'user{number}@example.com',
+              'first_name': 'Имя', 'last_name': 'Фамилия', **fields}
+    return User.objects.create_user(password='password', **fields)
+
+
+def create_recipe(author, **fields):
+    number = next(_numbers)
+    fields = {'name': f'Рецепт {number}', 'text': 'Описание',
+              'image': f'recipes/{number}.png', 'cooking_time': 10,
+              **fields}
+    return Recipe.objects.create(author=author, **fields)
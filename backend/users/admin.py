@@ -1,14 +1,18 @@
 from django.contrib import admin
 
 from users.models import User
+from recipes.admin import BackgroundDeletionAdmin
+from recipes.paginators import EstimatedCountPaginator
 
 
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(BackgroundDeletionAdmin):
     list_display = ('id', 'username', 'first_name',
                     'last_name', 'email')
     search_fields = ('username', 'email')
-    list_filter = ('username', 'email',)
+    list_filter = ('is_staff', 'is_active', 'is_hidden')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(User, UserAdmin)
@@ -14,6 +14,8 @@ class User(AbstractUser):
                               verbose_name='email')
     password = models.CharField(max_length=150, blank=False,
                                 verbose_name='Пароль')
+    is_hidden = models.BooleanField(default=False, db_index=True,
+                                    verbose_name='Скрыт до удаления')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name', 'password']